@@ -11,59 +11,133 @@ A mathematical assistant that:
 """
 import os
 import sys
-import json
+import base64
+import logging
+import time
+import asyncio
+import orjson
+import httpx
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import asynccontextmanager
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Literal, AsyncIterator, Tuple
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from fastapi.sse import EventSourceResponse, ServerSentEvent
+from pydantic import BaseModel, ConfigDict
 
 from core.pipeline import MathPipeline
 from core.models import MathResponse, ExplanationContext
 from core.instrumentation import instrumentation
-from langfuse import Langfuse
+from core.clients import HTTP2_AVAILABLE
 
 # Version
 VERSION = "2.0.0"
 
+log = logging.getLogger("mathai")
+
 # Global pipeline instance
 pipeline: Optional[MathPipeline] = None
 
+# Synthetic query used to warm up the pipeline on startup
+WARMUP_QUERY = "differentiate x^2"
+
+
+def _default_compute_processes() -> int:
+    """
+    Split the CPUs between uvicorn workers, since every worker starts its own pool.
+    
+    Defaulting each pool to the CPU count would start cpu_count**2 SymPy
+    processes with the default WORKERS.
+    """
+    cpus = os.cpu_count() or 1
+    if os.environ.get("MATHAI_ENV") == "development":
+        return cpus  # Single reloading worker
+    workers = int(os.environ.get("WORKERS", cpus))
+    return max(1, cpus // max(1, workers))
+
+
+def _create_pipeline(http_client: Optional[httpx.AsyncClient] = None) -> MathPipeline:
+    """Build the pipeline from environment configuration."""
+    # Using gpt-4o-mini for both router and explainer for speed
+    return MathPipeline(
+        router_model=os.environ.get("ROUTER_MODEL", "gpt-4o-mini"),
+        explainer_model=os.environ.get("EXPLAINER_MODEL", "gpt-4o-mini"),  # Changed from gpt-4o for speed
+        langfuse_enabled=os.environ.get("LANGFUSE_ENABLED", "true").lower() == "true",
+        redis_url=os.environ.get("REDIS_URL"),
+        http_client=http_client,
+        router_semantic_threshold=float(os.environ.get("ROUTER_SEMANTIC_THRESHOLD", 0)) or None,
+        router_cache_path=os.environ.get("ROUTER_CACHE_PATH")
+    )
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize resources on startup."""
     global pipeline
     
-    print(f"Starting MathAI v{VERSION}...")
+    # LOGLEVEL=WARNING skips per-request log formatting entirely
+    logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO").upper())
+    log.info("Starting MathAI v%s...", VERSION)
     
-    # Initialize the pipeline (using gpt-4o-mini for both router and explainer for speed)
-    pipeline = MathPipeline(
-        router_model=os.environ.get("ROUTER_MODEL", "gpt-4o-mini"),
-        explainer_model=os.environ.get("EXPLAINER_MODEL", "gpt-4o-mini"),  # Changed from gpt-4o for speed
-        langfuse_enabled=os.environ.get("LANGFUSE_ENABLED", "true").lower() == "true"
+    # Shared connection pool for all async LLM calls
+    http_client = httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
     )
     
+    # Initialize the pipeline
+    pipeline = _create_pipeline(http_client)
+    
+    # SymPy is pure Python and holds the GIL, so compute runs in worker processes.
+    # "spawn" avoids forking a process that already has client threads running.
+    compute_processes = int(os.environ.get("COMPUTE_PROCESSES", _default_compute_processes()))
+    if compute_processes > 0:
+        pipeline.compute_pool = ProcessPoolExecutor(
+            max_workers=compute_processes,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    
     # Initialize knowledge base (if vector DB available)
     try:
         pipeline.initialize()
-        print("Knowledge base initialized")
+        log.info("Knowledge base initialized")
     except Exception as e:
-        print(f"Warning: Could not initialize knowledge base: {e}")
+        log.warning("Could not initialize knowledge base: %s", e)
     
-    print("MathAI v2 ready!")
+    # Warm up: opens the LLM connection, loads SymPy and the vector index
+    warmup_timeout = float(os.environ.get("WARMUP_TIMEOUT", "5"))
+    if warmup_timeout > 0:
+        start = time.perf_counter()
+        try:
+            # The warmup query is routed locally, so warm the router's client directly
+            await asyncio.wait_for(asyncio.gather(
+                pipeline.aprocess(WARMUP_QUERY),
+                pipeline.router.awarm_up(warmup_timeout)
+            ), timeout=warmup_timeout)
+            log.info("Warmup completed in %.0fms", (time.perf_counter() - start) * 1000)
+        except Exception as e:
+            log.warning("Warmup skipped: %r", e)
+    
+    log.info("MathAI v2 ready!")
     
     yield
     
     # Cleanup
+    await pipeline.aclose()
+    if pipeline.shared_cache:
+        await pipeline.shared_cache.close()
+    await http_client.aclose()
+    if pipeline.compute_pool:
+        pipeline.compute_pool.shutdown(cancel_futures=True)
     instrumentation.flush()
-    print("MathAI shutdown complete")
+    log.info("MathAI shutdown complete")
 
 
 app = FastAPI(
@@ -85,9 +159,16 @@ app.add_middleware(
 # Request/Response models
 class SolveRequest(BaseModel):
     query: str
+    explain: bool = True  # False returns only the SymPy answer
+
+
+# Response models are immutable and reject unknown fields
+RESPONSE_MODEL_CONFIG = ConfigDict(extra="forbid", frozen=True)
 
 
 class SolveResponse(BaseModel):
+    model_config = RESPONSE_MODEL_CONFIG
+    
     success: bool
     query: str
     operation: str
@@ -100,11 +181,124 @@ class SolveResponse(BaseModel):
 
 
 class HealthResponse(BaseModel):
+    model_config = RESPONSE_MODEL_CONFIG
+    
     status: str
     version: str
     langfuse_enabled: bool
 
 
+# Server-Sent Event payloads for /solve/stream
+class AnswerData(BaseModel):
+    success: bool
+    query: str
+    operation: str
+    answer: Optional[str] = None
+    latex_answer: Optional[str] = None
+    assumptions: Optional[list] = None
+    citations: Optional[list] = None
+
+
+class AnswerEvent(BaseModel):
+    type: Literal["answer"] = "answer"
+    data: AnswerData
+
+
+class DoneEvent(BaseModel):
+    type: Literal["done"] = "done"
+    cached: bool = False
+
+
+class ErrorEvent(BaseModel):
+    type: Literal["error"] = "error"
+    data: str
+
+
+def _sse(payload: dict) -> ServerSentEvent:
+    """
+    Build a pre-serialized SSE event for the per-token hot path.
+    
+    Explanation tokens are sent as {"type": "explanation", "data": token}.
+    orjson escapes newlines, so the payload is always a single SSE data line
+    and the event can skip pydantic validation.
+    """
+    return ServerSentEvent.model_construct(raw_data=orjson.dumps(payload).decode())
+
+
+def _solve_response(result: MathResponse) -> SolveResponse:
+    """Convert a pipeline MathResponse into the public /solve response."""
+    return SolveResponse(
+        success=result.success,
+        query=result.query,
+        operation=result.operation,
+        answer=result.answer,
+        latex_answer=result.latex_answer,
+        explanation=result.explanation,
+        assumptions=result.assumptions,
+        citations=result.citations,
+        error=result.error
+    )
+
+
+def _cached_stream_payloads(response: MathResponse) -> Tuple[str, ...]:
+    """
+    Pre-serialize the events sent for a /solve/stream cache hit.
+    
+    The payloads are cached next to the response, so later hits replay
+    strings instead of rebuilding and re-serializing the event models.
+    """
+    payloads = [AnswerEvent(data=AnswerData(
+        success=response.success,
+        query=response.query,
+        operation=response.operation,
+        answer=response.answer,
+        latex_answer=response.latex_answer,
+        assumptions=response.assumptions,
+        citations=response.citations
+    )).model_dump_json()]
+    
+    # Send entire explanation at once (it's cached)
+    if response.explanation:
+        payloads.append(orjson.dumps({"type": "explanation", "data": response.explanation}).decode())
+    
+    payloads.append(DoneEvent(cached=True).model_dump_json())
+    return tuple(payloads)
+
+
+async def _resume_stream(first: asyncio.Future, stream: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Yield the already-requested first item of an async stream, then the rest."""
+    try:
+        yield await first
+    except StopAsyncIteration:
+        return
+    async for item in stream:
+        yield item
+
+
+async def _coalesce_tokens(
+    tokens: AsyncIterator[str],
+    max_tokens: int = 16,
+    max_delay: float = 0.05
+) -> AsyncIterator[str]:
+    """
+    Merge streamed tokens into small chunks to cut per-event SSE overhead.
+    
+    A chunk is emitted once it holds max_tokens tokens or max_delay seconds
+    have passed since the last emit (~one animation frame), whichever is first.
+    """
+    buffer = []
+    last_emit = time.monotonic()
+    async for token in tokens:
+        buffer.append(token)
+        now = time.monotonic()
+        if len(buffer) >= max_tokens or now - last_emit >= max_delay:
+            yield "".join(buffer)
+            buffer.clear()
+            last_emit = now
+    if buffer:
+        yield "".join(buffer)
+
+
 # Endpoints
 @app.get("/", response_model=dict)
 async def root():
@@ -130,7 +324,7 @@ async def health():
     )
 
 
-@app.post("/solve", response_model=SolveResponse)
+@app.post("/solve", response_model=SolveResponse, response_model_exclude_none=True)
 async def solve(request: SolveRequest):
     """
     Solve a mathematical query.
@@ -141,6 +335,7 @@ async def solve(request: SolveRequest):
     - Mixed: "simplify (x^2 - 1)/(x - 1)"
     
     Returns the authoritative SymPy result with an AI-generated explanation.
+    Set "explain": false to get only the answer, skipping the explanation LLM call.
     """
     global pipeline
     
@@ -157,28 +352,18 @@ async def solve(request: SolveRequest):
             error="Missing 'query' in request"
         )
     
-    print(f"[v2] Processing query: {query}")
+    log.debug("processing query=%s", query)
     
     try:
-        # Process through the pipeline
-        result = pipeline.process(query)
+        # Process through the pipeline without blocking the event loop
+        result = await pipeline.aprocess(query, explain=request.explain)
         
-        print(f"[v2] Result: {result.operation} -> {result.answer}")
+        log.debug("result operation=%s answer=%s", result.operation, result.answer)
         
-        return SolveResponse(
-            success=result.success,
-            query=result.query,
-            operation=result.operation,
-            answer=result.answer,
-            latex_answer=result.latex_answer,
-            explanation=result.explanation,
-            assumptions=result.assumptions,
-            citations=result.citations,
-            error=result.error
-        )
+        return _solve_response(result)
         
     except Exception as e:
-        print(f"[v2] Error: {str(e)}")
+        log.error("solve failed query=%s error=%s", query, e)
         return SolveResponse(
             success=False,
             query=query,
@@ -187,21 +372,13 @@ async def solve(request: SolveRequest):
         )
 
 
-@app.post("/solve/stream")
-async def solve_stream(request: SolveRequest):
+def require_stream_query(request: SolveRequest) -> str:
     """
-    Streaming endpoint that returns the answer immediately,
-    then streams the explanation for better perceived latency.
-    
-    Returns Server-Sent Events (SSE) with:
-    - First event: { type: "answer", data: {...} } with the computed answer
-    - Following events: { type: "explanation", data: "token" } with explanation tokens
-    - Final event: { type: "done" }
+    Validate a streaming request before the event stream starts.
     
-    Supports caching - cached responses return instantly without streaming.
+    Streaming endpoints cannot change their status code once the first
+    event is sent, so errors are raised from this dependency instead.
     """
-    global pipeline
-    
     if not pipeline:
         raise HTTPException(status_code=503, detail="Pipeline not initialized")
     
@@ -210,118 +387,118 @@ async def solve_stream(request: SolveRequest):
     if not query:
         raise HTTPException(status_code=400, detail="Missing query")
     
-    # Check cache first
-    cached = pipeline._get_cached_response(query)
-    if cached:
+    return query
+
+
+@app.post("/solve/stream", response_class=EventSourceResponse)
+async def solve_stream(query: str = Depends(require_stream_query)):
+    """
+    Streaming endpoint that returns the answer immediately,
+    then streams the explanation for better perceived latency.
+    
+    Returns Server-Sent Events (SSE) with:
+    - First event: { type: "answer", data: {...} } with the computed answer
+    - Following events: { type: "explanation", data: "text" } with explanation text,
+      coalesced into chunks of up to 16 tokens or ~50ms
+    - Final event: { type: "done" }
+    
+    FastAPI handles the SSE framing and sends keep-alive pings while the
+    explanation is being generated.
+    
+    Supports caching - cached responses return instantly without streaming.
+    """
+    # Check cache first (pre-serialized events, then in-process/shared Redis)
+    payloads = pipeline._get_cached_stream_payloads(query)
+    if payloads is None:
+        cached = await pipeline._aget_cached_response(query)
+        if cached:
+            payloads = _cached_stream_payloads(cached)
+            pipeline._set_cached_stream_payloads(query, payloads)
+    if payloads:
         # Return cached response as immediate stream
-        def generate_cached():
-            answer_data = {
-                "type": "answer",
-                "data": {
-                    "success": cached.success,
-                    "query": cached.query,
-                    "operation": cached.operation,
-                    "answer": cached.answer,
-                    "latex_answer": cached.latex_answer,
-                    "assumptions": cached.assumptions,
-                    "citations": cached.citations
-                }
-            }
-            yield f"data: {json.dumps(answer_data)}\n\n"
-            
-            # Send entire explanation at once (it's cached)
-            if cached.explanation:
-                yield f"data: {json.dumps({'type': 'explanation', 'data': cached.explanation})}\n\n"
-            
-            yield f"data: {json.dumps({'type': 'done', 'cached': True})}\n\n"
+        for payload in payloads:
+            yield ServerSentEvent.model_construct(raw_data=payload)
+        return
+    
+    explanation_buffer = []  # Collect tokens to cache later
+    first_token = None
+    
+    try:
+        # Step 1: Route the query
+        routing = await pipeline.router_batcher.route(query)
         
-        return StreamingResponse(
-            generate_cached(),
-            media_type="text/event-stream",
-            headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+        # Step 2 & 3: Compute (off the event loop) and retrieve concurrently
+        compute_result, retrieved_chunks = await asyncio.gather(
+            pipeline.acompute(routing),
+            pipeline.rag.aretrieve(routing, 5, min_score=0.5)
         )
-    
-    def generate():
-        explanation_buffer = []  # Collect tokens to cache later
         
-        try:
-            # Step 1: Route the query
-            routing = pipeline.router.route(query)
-            
-            # Step 2 & 3: Compute and retrieve (parallel via pipeline's executor)
-            compute_future = pipeline.executor.submit(pipeline.compute_engine.compute, routing)
-            rag_future = pipeline.executor.submit(pipeline.rag.retrieve, routing, 5)
-            
-            compute_result = compute_future.result()
-            retrieved_chunks = rag_future.result()
-            
-            citations = [f"[{c.chunk_id}] {c.category}" for c in retrieved_chunks if c.relevance_score > 0.5]
-            
-            # Send the answer immediately
-            answer_data = {
-                "type": "answer",
-                "data": {
-                    "success": compute_result.success,
-                    "query": query,
-                    "operation": routing.operation,
-                    "answer": compute_result.result,
-                    "latex_answer": compute_result.latex_result,
-                    "assumptions": routing.assumptions,
-                    "citations": citations
-                }
-            }
-            yield f"data: {json.dumps(answer_data)}\n\n"
-            
-            if not compute_result.success:
-                yield f"data: {json.dumps({'type': 'done'})}\n\n"
-                return
-            
-            # Step 4: Stream the explanation
-            explanation_context = ExplanationContext(
+        citations = [c.citation for c in retrieved_chunks]
+        
+        if compute_result.success:
+            # Start the explanation request before sending the answer so the
+            # LLM round-trip overlaps with the client receiving it
+            explanation_context = ExplanationContext.model_construct(
                 original_query=query,
                 routing_decision=routing,
                 compute_result=compute_result,
                 retrieved_chunks=retrieved_chunks
             )
-            
-            for token in pipeline.explainer.explain_stream(explanation_context):
-                explanation_buffer.append(token)
-                yield f"data: {json.dumps({'type': 'explanation', 'data': token})}\n\n"
-            
-            # Cache the complete response
-            full_explanation = "".join(explanation_buffer)
-            from core.models import MathResponse
-            response_to_cache = MathResponse(
-                success=True,
-                query=query,
-                operation=routing.operation,
-                answer=compute_result.result,
-                latex_answer=compute_result.latex_result,
-                explanation=full_explanation,
-                assumptions=routing.assumptions,
-                citations=citations
-            )
-            pipeline._cache_response(query, response_to_cache)
-            
-            # Flush LangFuse traces
+            explanation_stream = pipeline.explainer.aexplain_stream(explanation_context)
+            first_token = asyncio.ensure_future(anext(explanation_stream))
+        
+        # Send the answer immediately
+        yield ServerSentEvent(data=AnswerEvent(data=AnswerData(
+            success=compute_result.success,
+            query=query,
+            operation=routing.operation,
+            answer=compute_result.result,
+            latex_answer=compute_result.latex_result,
+            assumptions=routing.assumptions,
+            citations=citations
+        )))
+        
+        if not compute_result.success:
+            yield ServerSentEvent(data=DoneEvent())
+            return
+        
+        # Step 4: Stream the explanation
+        async for chunk in _coalesce_tokens(_resume_stream(first_token, explanation_stream)):
+            explanation_buffer.append(chunk)
+            yield _sse({"type": "explanation", "data": chunk})
+        
+        # Cache the complete response
+        full_explanation = "".join(explanation_buffer)
+        response_to_cache = MathResponse.model_construct(
+            success=True,
+            query=query,
+            operation=routing.operation,
+            answer=compute_result.result,
+            latex_answer=compute_result.latex_result,
+            explanation=full_explanation,
+            assumptions=routing.assumptions,
+            citations=citations
+        )
+        await pipeline._acache_response(
+            query, response_to_cache, _cached_stream_payloads(response_to_cache)
+        )
+        
+        # Flush LangFuse traces (network I/O, kept off the event loop)
+        if instrumentation.enabled:
             try:
-                Langfuse().flush()
+                await asyncio.to_thread(instrumentation.flush)
             except Exception:
                 pass
-            
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
-            
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'data': str(e)})}\n\n"
-    
-    return StreamingResponse(
-        generate(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        }
-    )
+        
+        yield ServerSentEvent(data=DoneEvent())
+        
+    except Exception as e:
+        yield ServerSentEvent(data=ErrorEvent(data=str(e)))
+    
+    finally:
+        # Client went away before the first explanation token was consumed
+        if first_token and not first_token.done():
+            first_token.cancel()
 
 
 @app.post("/solve/v1")
@@ -338,7 +515,7 @@ async def solve_v1(request: Request):
             return {"success": 0, "error": "Missing 'query' in request."}
         
         # Use v2 pipeline
-        result = pipeline.process(query)
+        result = await pipeline.aprocess(query)
         
         # Return in v1 format
         return {
@@ -359,7 +536,7 @@ if os.environ.get("MATHAI_ENV") == "development":
         if not pipeline:
             raise HTTPException(status_code=503, detail="Pipeline not initialized")
         
-        routing = pipeline.router.route(request.query)
+        routing = await pipeline.router.aroute(request.query)
         return {
             "operation": routing.operation,
             "expression": routing.expression,
@@ -375,8 +552,8 @@ if os.environ.get("MATHAI_ENV") == "development":
         if not pipeline:
             raise HTTPException(status_code=503, detail="Pipeline not initialized")
         
-        routing = pipeline.router.route(request.query)
-        result = pipeline.compute_engine.compute(routing)
+        routing = await pipeline.router.aroute(request.query)
+        result = await pipeline.acompute(routing)
         return {
             "routing": {
                 "operation": routing.operation,
@@ -392,11 +569,76 @@ if os.environ.get("MATHAI_ENV") == "development":
         }
 
 
+# AWS Lambda entry point (see template.yaml)
+@lru_cache(maxsize=1)
+def get_pipeline() -> MathPipeline:
+    """
+    Build the Lambda pipeline on first use.
+    
+    Deferring construction keeps module import cheap on cold start and lets
+    tests patch the environment (or the factory) before any client exists.
+    """
+    return _create_pipeline()
+
+
+@lru_cache(maxsize=1)
+def _get_lambda_loop() -> asyncio.AbstractEventLoop:
+    """Event loop reused across warm invocations so pooled LLM connections stay usable."""
+    return asyncio.new_event_loop()
+
+
+def lambda_handler(event, context):
+    """
+    Handle an API Gateway HTTP API request to /solve.
+    
+    Accepts the same JSON body as POST /solve and returns the same response.
+    The pipeline is created on the first invocation and reused while the
+    Lambda container stays warm.
+    """
+    try:
+        body = event.get("body") or "{}"
+        if event.get("isBase64Encoded"):
+            body = base64.b64decode(body)
+        request = SolveRequest.model_validate_json(body)
+        query = request.query.strip()
+    except ValueError as e:
+        response = SolveResponse(success=False, query="", operation="unknown", error=f"Invalid request: {e}")
+    else:
+        if not query:
+            response = SolveResponse(
+                success=False,
+                query="",
+                operation="unknown",
+                error="Missing 'query' in request"
+            )
+        else:
+            try:
+                result = _get_lambda_loop().run_until_complete(
+                    get_pipeline().aprocess(query, explain=request.explain)
+                )
+                response = _solve_response(result)
+            except Exception as e:
+                log.error("solve failed query=%s error=%s", query, e)
+                response = SolveResponse(success=False, query=query, operation="unknown", error=str(e))
+    
+    return {
+        "statusCode": 200,
+        "headers": {"Content-Type": "application/json"},
+        "body": response.model_dump_json(exclude_none=True)
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
+    reload = os.environ.get("MATHAI_ENV") == "development"
     uvicorn.run(
         "app:app",
         host="0.0.0.0",
         port=int(os.environ.get("PORT", 8000)),
-        reload=os.environ.get("MATHAI_ENV") == "development"
+        reload=reload,
+        # uvloop + httptools cut per-event overhead (uvloop has no Windows build)
+        loop="auto" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        # Multiple workers are not supported with reload
+        workers=None if reload else int(os.environ.get("WORKERS", os.cpu_count() or 1))
     )
@@ -1,9 +1,22 @@
 # MathAI v2 Core Modules
-from .router import MathRouter
-from .compute import SymPyEngine
-from .rag import MathRAG
-from .explainer import MathExplainer
-from .pipeline import MathPipeline
+#
+# Exports resolve on first access, so importing one submodule (core.compute,
+# core.router, ...) does not load chromadb, openai and langfuse for the rest.
+from importlib import import_module
 
-__all__ = ["MathRouter", "SymPyEngine", "MathRAG", "MathExplainer", "MathPipeline"]
+_EXPORTS = {
+    "MathRouter": ".router",
+    "RouterBatcher": ".router",
+    "SymPyEngine": ".compute",
+    "MathRAG": ".rag",
+    "MathExplainer": ".explainer",
+    "MathPipeline": ".pipeline",
+}
 
+__all__ = ["MathRouter", "RouterBatcher", "SymPyEngine", "MathRAG", "MathExplainer", "MathPipeline"]
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(_EXPORTS[name], __name__), name)
@@ -0,0 +1,135 @@
+"""
+Shared Response Cache backed by Redis.
+
+Lets every uvicorn worker share cached MathResponses and adds single-flight
+protection: when several workers receive the same uncached query, only the
+lock holder runs the pipeline and the others wait for its published result.
+
+Redis is optional. Without the `redis` package or a configured URL the
+pipeline falls back to its in-process cache.
+"""
+import asyncio
+from typing import Optional
+from .models import MathResponse
+
+# Try importing the async Redis client
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+class RedisResponseCache:
+    """
+    Async Redis cache for MathResponses with TTL and stampede protection.
+    All Redis errors are treated as cache misses so the pipeline keeps working
+    if Redis is unreachable.
+    """
+
+    KEY_PREFIX = "mathai:response:"
+    LOCK_PREFIX = "mathai:lock:"
+    CHANNEL_PREFIX = "mathai:ready:"
+    # Published on release so waiters stop waiting when no result is coming
+    DONE_SENTINEL = b""
+
+    def __init__(
+        self,
+        url: str,
+        ttl_seconds: int = 3600,
+        lock_ttl_seconds: int = 30
+    ):
+        self.redis = aioredis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.lock_ttl_seconds = lock_ttl_seconds
+
+    async def get(self, key: str) -> Optional[MathResponse]:
+        """Fetch a cached response, or None on miss."""
+        try:
+            payload = await self.redis.get(self.KEY_PREFIX + key)
+        except Exception:
+            return None
+        if payload is None:
+            return None
+        return MathResponse.model_validate_json(payload)
+
+    async def set(self, key: str, response: MathResponse):
+        """Store a response with the cache TTL and notify any waiters."""
+        payload = response.model_dump_json()
+        try:
+            await self.redis.setex(self.KEY_PREFIX + key, self.ttl_seconds, payload)
+            await self.redis.publish(self.CHANNEL_PREFIX + key, payload)
+        except Exception:
+            pass  # Cache errors should not break the pipeline
+
+    async def acquire(self, key: str) -> bool:
+        """
+        Try to become the single worker computing this key.
+
+        Returns:
+            True if the lock was acquired (or Redis is unavailable)
+        """
+        try:
+            acquired = await self.redis.set(
+                self.LOCK_PREFIX + key, 1, nx=True, ex=self.lock_ttl_seconds
+            )
+        except Exception:
+            return True
+        return bool(acquired)
+
+    async def release(self, key: str):
+        """
+        Release the compute lock for a key and wake any waiters.
+
+        A successful run has already published its response via set(); after
+        a failure the sentinel tells waiters to compute the query themselves
+        instead of waiting out the lock TTL.
+        """
+        try:
+            await self.redis.delete(self.LOCK_PREFIX + key)
+            await self.redis.publish(self.CHANNEL_PREFIX + key, self.DONE_SENTINEL)
+        except Exception:
+            pass
+
+    async def wait_for(self, key: str) -> Optional[MathResponse]:
+        """
+        Wait for the lock holder to publish a result for this key.
+
+        Returns:
+            The published response, or None if the holder released the lock
+            without one or it did not arrive before the lock expired (the
+            caller should then compute it itself)
+        """
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.subscribe(self.CHANNEL_PREFIX + key)
+
+            # The result may have been published before we subscribed
+            cached = await self.get(key)
+            if cached:
+                return cached
+
+            # ...or the holder may already have released the lock without one
+            if not await self.redis.exists(self.LOCK_PREFIX + key):
+                return None
+
+            return await asyncio.wait_for(self._next_message(pubsub), self.lock_ttl_seconds)
+        except Exception:
+            return None
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+    async def _next_message(self, pubsub) -> Optional[MathResponse]:
+        """Block until a response (or the release sentinel) arrives on the channel."""
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                if message["data"] == self.DONE_SENTINEL:
+                    return None
+                return MathResponse.model_validate_json(message["data"])
+
+    async def close(self):
+        """Close the Redis connection pool."""
+        await self.redis.aclose()
@@ -0,0 +1,53 @@
+"""
+Shared OpenAI client factory.
+
+Used by the router, explainer and pipeline so every component in a process
+reuses one sync client and its connection pool.
+"""
+import httpx
+from types import ModuleType
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# HTTP/2 support for httpx is optional (pip install "httpx[http2]")
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# One sync client per process so every component reuses its connection pool
+_SHARED_CLIENT: Optional["OpenAI"] = None
+
+
+def get_openai() -> ModuleType:
+    """
+    Return the LangFuse-wrapped openai module (plain openai without langfuse).
+    
+    Imported on first use: openai and langfuse.openai take ~0.5s to import,
+    which cache-only and compute-only processes never need to pay.
+    """
+    try:
+        from langfuse.openai import openai
+    except ImportError:
+        import openai
+    return openai
+
+
+def get_client() -> "OpenAI":
+    """
+    Return the process-wide (LangFuse-wrapped) OpenAI client, creating it once.
+    
+    Its httpx pool keeps connections alive between calls (and multiplexes
+    them over HTTP/2 when h2 is installed), so only the first call pays the
+    TCP+TLS handshake.
+    """
+    global _SHARED_CLIENT
+    if _SHARED_CLIENT is None:
+        _SHARED_CLIENT = get_openai().OpenAI(http_client=httpx.Client(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        ))
+    return _SHARED_CLIENT
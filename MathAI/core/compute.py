@@ -5,7 +5,13 @@ This is the ONLY place where math is actually computed.
 All results are authoritative and come directly from SymPy.
 """
 import re
-from typing import Optional, List, Tuple
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from importlib.util import find_spec
+from types import ModuleType
+from typing import Optional, List, Tuple, Sequence, Callable
+import numpy as np
 from sympy import (
     symbols, Symbol, diff, integrate, simplify, solve, expand, factor,
     sin, cos, tan, cot, sec, csc,
@@ -14,7 +20,8 @@ from sympy import (
     asinh, acosh, atanh, acoth, asech, acsch,
     log, ln, exp, sqrt, Abs, sign,
     pi, E, I, oo,
-    Eq, latex, S
+    Eq, Integral, latex, S, srepr, cancel, together, factor_terms, trigsimp, cse,
+    lambdify
 )
 from sympy.parsing.sympy_parser import (
     parse_expr,
@@ -24,8 +31,116 @@ from sympy.parsing.sympy_parser import (
     function_exponentiation
 )
 from sympy.parsing.latex import parse_latex
-from langfuse import observe
 from .models import RoutingDecision, ComputeResult
+from .instrumentation import observe
+
+# Numba JIT-compiles numeric evaluators when installed. It is the slowest
+# import in the app, so it is imported on first numeric compile instead of
+# at startup; symbolic-only processes never load it.
+NUMBA_AVAILABLE = find_spec("numba") is not None
+
+
+@lru_cache(maxsize=1)
+def _numba() -> ModuleType:
+    """Import numba on first use."""
+    import numba
+    return numba
+
+
+@lru_cache(maxsize=1)
+def _eval_batch_kernel() -> Callable:
+    """Build the parallel batch evaluation kernel on first use."""
+    numba = _numba()
+    
+    @numba.njit(parallel=True, fastmath=True)
+    def _eval_batch(f, xs):
+        """Apply a jitted scalar function to every point, spread over all cores."""
+        out = np.empty_like(xs)
+        for i in numba.prange(xs.size):
+            out[i] = f(xs[i])
+        return out
+    
+    return _eval_batch
+
+
+# Parsed expressions keyed by normalized input. SymPy expressions are
+# immutable, so cached results can be shared. Module-level so the cache
+# persists inside each compute worker process.
+_parse_cache: "OrderedDict[str, Tuple[Optional[any], Optional[str]]]" = OrderedDict()
+_parse_cache_lock = threading.Lock()
+_PARSE_CACHE_MAX_SIZE = 4096
+
+# Results of differentiate/integrate/simplify/solve keyed by
+# (operation, srepr(expr), srepr(var), ...). simplify and integrate often
+# dominate request latency, and repeated inputs give identical results.
+_COMPUTE_CACHE: "OrderedDict[tuple, ComputeResult]" = OrderedDict()
+_compute_cache_lock = threading.Lock()
+_COMPUTE_CACHE_MAX_SIZE = 2048
+
+# Whitespace around operators does not change the parse
+_OPERATOR_SPACE_RE = re.compile(r"\s*([-+*/^=(),])\s*")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Any backslash or opening brace marks LaTeX (\frac, \sqrt, ^{, _{, ...)
+_LATEX_RE = re.compile(r"[\\{]")
+
+# _preprocess rewrites in one pass: drop a trailing differential ("dx") and
+# "= 0", and turn multiplication signs into "*"
+_PREPROCESS_RE = re.compile(r"\s*[dD][a-zA-Z]\s*$|= ?0|[×·]|\\cdot|\\times")
+_PREPROCESS_REPLACEMENTS = {"×": "*", "·": "*", "\\cdot": "*", "\\times": "*"}
+
+
+def _preprocess_replacement(match: re.Match) -> str:
+    """Replacement for a _PREPROCESS_RE match."""
+    return _PREPROCESS_REPLACEMENTS.get(match.group(), "")
+
+# Symbols for variables outside SYMBOL_MAP, created once per name
+_make_symbol = lru_cache(maxsize=256)(symbols)
+
+
+@lru_cache(maxsize=256)
+def _compile_numeric(expr, variables: Tuple[Symbol, ...]) -> Callable:
+    """
+    Compile a SymPy expression into a fast numeric function.
+    
+    Uses lambdify with CSE into NumPy code, then JIT-compiles it with Numba
+    when available. Falls back to the NumPy function if Numba cannot type it.
+    """
+    func = lambdify(variables, expr, modules="numpy", cse=True)
+    if not NUMBA_AVAILABLE:
+        return func
+    try:
+        numba = _numba()
+        # Lambdified functions have no source file, so Numba's disk cache is not used
+        jitted = numba.njit(fastmath=True)(func)
+        jitted.compile((numba.float64,) * len(variables))
+        return jitted
+    except Exception:
+        return func
+
+
+@lru_cache(maxsize=64)
+def _compile_numeric_many(exprs: Tuple, variable: Symbol) -> Callable:
+    """
+    Compile several expressions into one NumPy function returning all of them.
+    
+    CSE runs across the whole set, so subexpressions the expressions share
+    (sin(x), x**2, ...) are evaluated once per call.
+    """
+    return lambdify((variable,), list(exprs), modules="numpy", cse=True)
+
+
+def normalize_expression(expr_str: str) -> str:
+    """
+    Normalize an expression string for parse caching.
+    
+    Collapses whitespace and drops it around operators, so "x^2 + 1" and
+    "x^2+1" share a cache entry. Spaces between names are kept because
+    implicit multiplication depends on them ("sin x" vs "sinx"), and case
+    is kept because symbols are case-sensitive.
+    """
+    expr_str = _WHITESPACE_RE.sub(" ", expr_str.strip())
+    return _OPERATOR_SPACE_RE.sub(r"\1", expr_str)
 
 
 class SymPyEngine:
@@ -57,7 +172,7 @@ class SymPyEngine:
         "sinh": sinh, "cosh": cosh, "tanh": tanh,
         "coth": coth, "sech": sech, "csch": csch,
         "asin": asin, "acos": acos, "atan": atan,
-        "arcsin": asin, "arccos": acos, "c": atan,
+        "arcsin": asin, "arccos": acos, "arctan": atan,
         "acot": acot, "asec": asec, "acsc": acsc,
         "asinh": asinh, "acosh": acosh, "atanh": atanh,
         "acoth": acoth, "asech": asech, "acsch": acsch,
@@ -66,25 +181,47 @@ class SymPyEngine:
         "pi": pi, "e": E, "i": I
     }
     
+    # Built once per class rather than per instance. parse_expr requires a real
+    # dict (not a MappingProxyType); it only reads these entries, so sharing
+    # one dict is safe.
+    LOCAL_DICT = {**SYMBOL_MAP, **FUNCTION_MAP}
+    
+    TRANSFORMATIONS = (
+        standard_transformations +
+        (implicit_multiplication_application, convert_xor, function_exponentiation)
+    )
+    
     def __init__(self):
-        self.transformations = (
-            standard_transformations +
-            (implicit_multiplication_application, convert_xor, function_exponentiation)
-        )
-        self.local_dict = {**self.SYMBOL_MAP, **self.FUNCTION_MAP}
+        self.transformations = self.TRANSFORMATIONS
+        self.local_dict = self.LOCAL_DICT
     
     def _parse_expression(self, expr_str: str) -> Tuple[Optional[any], Optional[str]]:
         """
-        Parse a mathematical expression from string.
+        Parse a mathematical expression from string, using the parse cache.
         Handles plain text, LaTeX, and mixed formats.
         
         Returns:
             Tuple of (parsed_expr, error_message)
         """
-        expr_str = expr_str.strip()
+        key = normalize_expression(expr_str)
+        with _parse_cache_lock:
+            cached = _parse_cache.get(key)
+            if cached is not None:
+                _parse_cache.move_to_end(key)
+                return cached
         
+        parsed = self._parse_uncached(key)
+        
+        with _parse_cache_lock:
+            _parse_cache[key] = parsed
+            if len(_parse_cache) > _PARSE_CACHE_MAX_SIZE:
+                _parse_cache.popitem(last=False)
+        return parsed
+    
+    def _parse_uncached(self, expr_str: str) -> Tuple[Optional[any], Optional[str]]:
+        """Parse a normalized expression string without consulting the cache."""
         # Try LaTeX parsing first if it looks like LaTeX
-        if any(tex in expr_str for tex in ["\\frac", "\\sqrt", "\\int", "\\sum", "\\cdot", "^{", "_{", "\\", "{"]):
+        if _LATEX_RE.search(expr_str):
             try:
                 # Clean up LaTeX
                 cleaned = expr_str.replace("\\,", "").replace("\\;", "").replace("\\!", "")
@@ -109,44 +246,132 @@ class SymPyEngine:
             return None, f"Failed to parse expression: {str(e)}"
     
     def _preprocess(self, expr: str) -> str:
-        """Preprocess expression string for better parsing."""
-        # Remove 'dx', 'dy' etc. at the end (common in integrals)
-        expr = re.sub(r'\s*d[a-z]\s*$', '', expr, flags=re.IGNORECASE)
-        
-        # Handle = 0 for solve operations
-        expr = expr.replace("= 0", "").replace("=0", "").strip()
-        
-        # Replace ^ with ** for exponentiation
-        # (convert_xor should handle this, but just in case)
-        
-        # Handle multiplication notation
-        expr = expr.replace("×", "*").replace("·", "*")
-        
-        # Handle common LaTeX-ish patterns
-        expr = expr.replace("\\cdot", "*")
-        expr = expr.replace("\\times", "*")
+        """
+        Preprocess expression string for better parsing.
         
-        return expr
+        Removes a trailing 'dx' (common in integrals) and '= 0' (solve), and
+        maps ×, ·, \\cdot and \\times to '*'. ^ and implicit multiplication
+        are left to the convert_xor and implicit multiplication transformations.
+        """
+        return _PREPROCESS_RE.sub(_preprocess_replacement, expr).strip()
     
     def _get_variable(self, var_name: str) -> Symbol:
         """Get or create a SymPy symbol for the variable."""
         if var_name in self.SYMBOL_MAP:
             return self.SYMBOL_MAP[var_name]
-        return symbols(var_name)
+        return _make_symbol(var_name)
+    
+    def numeric_evaluator(
+        self,
+        expression: str,
+        variables: Sequence[str] = ("x",)
+    ) -> Optional[Callable]:
+        """
+        Build a fast numeric function for an expression (plotting, checking roots).
+        
+        Args:
+            expression: Expression string in any format the engine parses
+            variables: Names of the function arguments, in order
+            
+        Returns:
+            Callable taking floats or NumPy arrays, or None if parsing fails
+        """
+        expr, parse_error = self._parse_expression(expression)
+        if parse_error:
+            return None
+        symbols_ = tuple(self._get_variable(name) for name in variables)
+        return _compile_numeric(expr, symbols_)
+    
+    def evaluate_batch(
+        self,
+        expression: str,
+        xs: np.ndarray,
+        variable: str = "x"
+    ) -> Optional[np.ndarray]:
+        """
+        Evaluate a single-variable expression at many points (plots, root checks).
+        
+        Args:
+            expression: Expression string in any format the engine parses
+            xs: 1-D array of points to evaluate at
+            variable: Name of the variable the points are substituted for
+            
+        Returns:
+            float64 array of values, same shape as xs, or None if parsing fails
+        """
+        func = self.numeric_evaluator(expression, (variable,))
+        if func is None:
+            return None
+        
+        xs = np.ascontiguousarray(xs, dtype=np.float64)
+        
+        # Numba-compiled evaluators run in a parallel loop; otherwise the
+        # lambdified NumPy function is already vectorized
+        if NUMBA_AVAILABLE and hasattr(func, "py_func"):
+            try:
+                return _eval_batch_kernel()(func, xs)
+            except Exception:
+                func = func.py_func
+        
+        out = np.empty_like(xs)
+        out[...] = func(xs)  # Broadcasts constant expressions
+        return out
+    
+    def evaluate_many(
+        self,
+        expressions: Sequence[str],
+        xs: np.ndarray,
+        variable: str = "x"
+    ) -> np.ndarray:
+        """
+        Evaluate several single-variable expressions at the same points.
+        
+        All expressions are compiled into one vectorized NumPy function (cached
+        per expression set), so each array operation runs over every point at
+        once and shared subexpressions are computed once.
+        
+        Args:
+            expressions: Expression strings in any format the engine parses
+            xs: 1-D array of points to evaluate at
+            variable: Name of the variable the points are substituted for
+            
+        Returns:
+            float64 array of shape (len(expressions), len(xs)); rows for
+            expressions that fail to parse are NaN
+        """
+        xs = np.ascontiguousarray(xs, dtype=np.float64)
+        out = np.full((len(expressions), xs.size), np.nan)
+        
+        parsed = [self._parse_expression(expression) for expression in expressions]
+        rows = [i for i, (_, parse_error) in enumerate(parsed) if not parse_error]
+        if not rows:
+            return out
+        
+        func = _compile_numeric_many(tuple(parsed[i][0] for i in rows), self._get_variable(variable))
+        for i, values in zip(rows, func(xs)):
+            out[i] = values  # Broadcasts constant expressions
+        return out
     
     @observe(name="sympy_compute")
-    def compute(self, routing: RoutingDecision) -> ComputeResult:
+    def compute(self, routing: RoutingDecision, steps: bool = True) -> ComputeResult:
         """
         Execute the mathematical operation specified by the routing decision.
         
         Args:
             routing: The RoutingDecision from the router
+            steps: Set to False to skip building intermediate_steps (the
+                extra LaTeX rendering and CSE pass) when nothing will explain them
             
         Returns:
             ComputeResult with the authoritative SymPy result
         """
-        # Parse the expression
-        expr, parse_error = self._parse_expression(routing.expression)
+        # Parse the expression. Equations are split first and each side parsed
+        # once, giving lhs - rhs (parse_expr cannot handle "=").
+        sides = routing.expression.split("=")
+        if routing.operation == "solve" and len(sides) == 2:
+            expr, parse_error = self._parse_equation(*sides)
+        else:
+            expr, parse_error = self._parse_expression(routing.expression)
         if parse_error:
             return ComputeResult(
                 success=False,
@@ -159,14 +384,18 @@ class SymPyEngine:
         
         try:
             if routing.operation == "differentiate":
-                return self._differentiate(expr, var)
+                key = ("differentiate", srepr(expr), srepr(var))
+                return self._cached(key, steps, lambda: self._differentiate(expr, var, steps))
             elif routing.operation == "integrate":
-                return self._integrate(expr, var)
+                key = ("integrate", srepr(expr), srepr(var))
+                return self._cached(key, steps, lambda: self._integrate(expr, var, steps))
             elif routing.operation == "simplify":
-                return self._simplify(expr)
+                key = ("simplify", srepr(expr))
+                return self._cached(key, steps, lambda: self._simplify(expr, steps))
             elif routing.operation == "solve":
                 solve_var = self._get_variable(routing.solve_for or routing.variable)
-                return self._solve(expr, solve_var, routing.expression)
+                key = ("solve", srepr(expr), srepr(solve_var))
+                return self._cached(key, steps, lambda: self._solve(expr, solve_var, steps))
             else:
                 return ComputeResult(
                     success=False,
@@ -180,28 +409,84 @@ class SymPyEngine:
                 error_type="computation_error"
             )
     
-    def _differentiate(self, expr, var: Symbol) -> ComputeResult:
+    def _cached(self, key: tuple, steps: bool, run) -> ComputeResult:
+        """
+        Return the cached result for key, or run the computation and cache it.
+        
+        Args:
+            key: Hashable (operation, srepr(expr), ...) cache key
+            steps: Whether the caller needs intermediate_steps. A result with
+                steps also serves callers that do not.
+            run: Zero-argument callable performing the computation
+            
+        Returns:
+            A copy of the cached ComputeResult
+        """
+        with _compute_cache_lock:
+            for lookup in ((key, True),) if steps else ((key, True), (key, False)):
+                cached = _COMPUTE_CACHE.get(lookup)
+                if cached is not None:
+                    _COMPUTE_CACHE.move_to_end(lookup)
+                    return cached.model_copy(deep=True)
+        
+        result = run()
+        
+        with _compute_cache_lock:
+            _COMPUTE_CACHE[(key, steps)] = result
+            if len(_COMPUTE_CACHE) > _COMPUTE_CACHE_MAX_SIZE:
+                _COMPUTE_CACHE.popitem(last=False)
+        return result.model_copy(deep=True)
+    
+    # Functions whose derivatives benefit from trigsimp rather than cancel
+    TRIG_FUNCTIONS = (sin, cos, tan, cot, sec, csc)
+    
+    def _differentiate(self, expr, var: Symbol, steps: bool = True) -> ComputeResult:
         """Compute the derivative."""
         result = diff(expr, var)
-        simplified = simplify(result)
+        
+        # simplify() is SymPy's slowest routine; derivatives usually only need
+        # trigsimp() (trig terms) or cancel()/together() (everything else).
+        if result.is_Atom:
+            simplified = result
+        elif result.has(*self.TRIG_FUNCTIONS):
+            simplified = trigsimp(result)
+        else:
+            simplified = min(
+                (cancel(result), factor_terms(together(result))),
+                key=lambda candidate: len(str(candidate))
+            )
+        
+        # Full simplify only when the cheap pass made things worse
+        simplified_str = str(simplified)
+        if len(simplified_str) > len(str(result)):
+            simplified = simplify(result)
+            simplified_str = str(simplified)
+        
+        latex_simplified = latex(simplified)
+        if not steps:
+            return ComputeResult(success=True, result=simplified_str, latex_result=latex_simplified)
+        
+        # latex() walks the whole tree, so each form is rendered once
+        latex_result = latex_simplified if simplified is result else latex(result)
         
         return ComputeResult(
             success=True,
-            result=str(simplified),
-            latex_result=latex(simplified),
+            result=simplified_str,
+            latex_result=latex_simplified,
             intermediate_steps=[
                 f"Original: {latex(expr)}",
-                f"Apply d/d{var}: {latex(result)}",
-                f"Simplified: {latex(simplified)}"
+                f"Apply d/d{var}: {latex_result}",
+                f"Simplified: {latex_simplified}"
             ]
         )
     
-    def _integrate(self, expr, var: Symbol) -> ComputeResult:
+    def _integrate(self, expr, var: Symbol, steps: bool = True) -> ComputeResult:
         """Compute the indefinite integral."""
         result = integrate(expr, var)
         
-        # Check if integration was successful (SymPy returns unevaluated integral if it can't solve)
-        if result.has(integrate):
+        # Check if integration was successful (SymPy returns unevaluated integral if it can't solve).
+        # The failure result goes into the compute cache too, so hard integrands are not retried.
+        if isinstance(result, Integral) or result.has(Integral):
             return ComputeResult(
                 success=False,
                 error="Could not find closed-form antiderivative",
@@ -210,58 +495,116 @@ class SymPyEngine:
                 latex_result=latex(result)
             )
         
+        latex_result = latex(result)
+        if not steps:
+            return ComputeResult(
+                success=True, result=f"{str(result)} + C", latex_result=f"{latex_result} + C"
+            )
+        latex_expr = latex(expr)
+        
         return ComputeResult(
             success=True,
             result=f"{str(result)} + C",
-            latex_result=f"{latex(result)} + C",
+            latex_result=f"{latex_result} + C",
             intermediate_steps=[
-                f"Integrand: {latex(expr)}",
-                f"∫ {latex(expr)} d{var} = {latex(result)} + C"
+                f"Integrand: {latex_expr}",
+                f"∫ {latex_expr} d{var} = {latex_result} + C"
             ]
         )
     
-    def _simplify(self, expr) -> ComputeResult:
+    def _simplify(self, expr, steps: bool = True) -> ComputeResult:
         """Simplify the expression."""
+        # Atoms and single-operation expressions (x, 2, x + 1, sin(x)) cannot
+        # get any shorter, so skip the three SymPy passes. The parser keeps
+        # input unevaluated, so rebuilding the node catches x + x and x/x.
+        if expr.is_Atom or (
+            expr.count_ops() < 2 and str(expr) == str(expr.func(*expr.args))
+        ):
+            latex_expr = latex(expr)
+            return ComputeResult(
+                success=True,
+                result=str(expr),
+                latex_result=latex_expr,
+                intermediate_steps=[f"Already simple: {latex_expr}"] if steps else []
+            )
+        
         # Try multiple simplification strategies
         simplified = simplify(expr)
         expanded = expand(expr)
         factored = factor(expr)
         
+        # str() walks the whole tree, so each form is printed once
+        s_expr, s_simp, s_exp, s_fact = map(str, (expr, simplified, expanded, factored))
+        
         # Choose the "simplest" form (shortest string representation)
         candidates = [
-            ("simplified", simplified),
-            ("expanded", expanded),
-            ("factored", factored)
+            ("simplified", simplified, s_simp),
+            ("expanded", expanded, s_exp),
+            ("factored", factored, s_fact)
         ]
-        best_name, best_result = min(candidates, key=lambda x: len(str(x[1])))
+        best_name, best_result, best_str = min(candidates, key=lambda x: len(x[2]))
+        best_latex = latex(best_result)
+        if not steps:
+            return ComputeResult(success=True, result=best_str, latex_result=best_latex)
         
-        steps = [f"Original: {latex(expr)}"]
-        if str(simplified) != str(expr):
-            steps.append(f"Simplified: {latex(simplified)}")
-        if str(expanded) != str(expr) and str(expanded) != str(simplified):
-            steps.append(f"Expanded: {latex(expanded)}")
-        if str(factored) != str(expr) and str(factored) not in [str(simplified), str(expanded)]:
-            steps.append(f"Factored: {latex(factored)}")
-        steps.append(f"Best form ({best_name}): {latex(best_result)}")
+        step_list = [f"Original: {latex(expr)}"]
+        if s_simp != s_expr:
+            step_list.append(f"Simplified: {latex(simplified)}")
+        if s_exp != s_expr and s_exp != s_simp:
+            step_list.append(f"Expanded: {latex(expanded)}")
+        if s_fact != s_expr and s_fact not in (s_simp, s_exp):
+            step_list.append(f"Factored: {latex(factored)}")
+        step_list.append(f"Best form ({best_name}): {best_latex}")
+        step_list.extend(self._common_subexpression_steps(best_result, best_str))
         
         return ComputeResult(
             success=True,
-            result=str(best_result),
-            latex_result=latex(best_result),
-            intermediate_steps=steps
+            result=best_str,
+            latex_result=best_latex,
+            intermediate_steps=step_list
         )
     
-    def _solve(self, expr, var: Symbol, original_expr: str) -> ComputeResult:
-        """Solve the equation for the given variable."""
-        # Check if it's an equation (contains =)
-        if "=" in original_expr:
-            parts = original_expr.split("=")
-            if len(parts) == 2:
-                left, _ = self._parse_expression(parts[0])
-                right, _ = self._parse_expression(parts[1])
-                if left is not None and right is not None:
-                    expr = left - right
+    def _common_subexpression_steps(self, expr, expr_str: str) -> List[str]:
+        """
+        Rewrite an expression with named common subexpressions.
         
+        Args:
+            expr: The expression to reduce
+            expr_str: str(expr), already computed by the caller
+        
+        Returns:
+            Steps listing each substitution and the reduced expression, or an
+            empty list when CSE does not make the expression more compact
+        """
+        replacements, reduced = cse([expr], optimizations="basic")
+        if not replacements:
+            return []
+        
+        reduced_size = len(str(reduced[0])) + sum(len(str(rhs)) for _, rhs in replacements)
+        if reduced_size >= len(expr_str):
+            return []
+        
+        steps = [f"Let {latex(symbol)} = {latex(rhs)}" for symbol, rhs in replacements]
+        steps.append(f"With common subexpressions: {latex(reduced[0])}")
+        return steps
+    
+    def _parse_equation(self, left: str, right: str) -> Tuple[Optional[any], Optional[str]]:
+        """
+        Parse both sides of an equation into a single expression equal to zero.
+        
+        Returns:
+            Tuple of (left - right, error_message)
+        """
+        left_expr, parse_error = self._parse_expression(left)
+        if parse_error:
+            return None, parse_error
+        right_expr, parse_error = self._parse_expression(right)
+        if parse_error:
+            return None, parse_error
+        return left_expr - right_expr, None
+    
+    def _solve(self, expr, var: Symbol, steps: bool = True) -> ComputeResult:
+        """Solve the equation expr = 0 for the given variable."""
         solutions = solve(expr, var)
         
         if not solutions:
@@ -281,8 +624,10 @@ class SymPyEngine:
         else:
             result_str = f"{var} = " + " or ".join(str(s) for s in solutions)
             latex_str = f"{latex(var)} = " + " \\text{{ or }} ".join(latex(s) for s in solutions)
+        if not steps:
+            return ComputeResult(success=True, result=result_str, latex_result=latex_str)
         
-        steps = [
+        step_list = [
             f"Equation: {latex(expr)} = 0",
             f"Solving for {var}...",
             f"Solutions: {latex_str}"
@@ -292,6 +637,30 @@ class SymPyEngine:
             success=True,
             result=result_str,
             latex_result=latex_str,
-            intermediate_steps=steps
+            intermediate_steps=step_list
         )
 
+
+# Engine used by compute pool workers, created once per worker process
+_worker_engine: Optional[SymPyEngine] = None
+
+
+def compute_in_worker(routing: RoutingDecision, steps: bool = True) -> ComputeResult:
+    """
+    Compute entry point for ProcessPoolExecutor workers.
+    
+    Submitting this module-level function means only the RoutingDecision is
+    pickled per call, not a bound method carrying the engine and its parser
+    namespace.
+    
+    Args:
+        routing: The RoutingDecision from the router
+        steps: Whether to build intermediate_steps
+        
+    Returns:
+        ComputeResult from the worker's SymPyEngine
+    """
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = SymPyEngine()
+    return _worker_engine.compute(routing, steps)
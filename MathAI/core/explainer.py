@@ -10,11 +10,14 @@ Generates step-by-step explanations grounded in:
 The LLM is explicitly instructed NOT to compute new math—only to explain.
 Supports both regular and streaming responses.
 """
-from typing import Optional, List, Generator
-from openai import OpenAI
-from langfuse import observe
-from langfuse.openai import openai  # LangFuse-wrapped OpenAI for token tracking
+import io
+from typing import TYPE_CHECKING, Optional, List, Generator, AsyncGenerator
 from .models import ExplanationContext, RetrievedChunk
+from .instrumentation import observe
+from .clients import get_client, get_openai
+
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI
 
 
 EXPLAINER_SYSTEM_PROMPT = """You are a math tutor explaining a calculation that has ALREADY been performed.
@@ -33,10 +36,27 @@ Your explanation should:
 - Help the user understand the intuition behind each step
 - Be clear, educational, and appropriately detailed
 
+For each request, explain:
+1. What mathematical operation was needed and why
+2. The step-by-step process to arrive at this answer
+3. Any important rules or techniques used
+4. Potential edge cases or things to watch out for
+
 Format your response as a clear step-by-step explanation using numbered steps.
 Use LaTeX notation (wrapped in $...$ for inline or $$...$$ for display) for mathematical expressions.
 """
 
+# Static text comes first so every request shares the longest possible
+# prefix with OpenAI's prompt cache; only the context varies.
+EXPLAINER_USER_PROMPT = """Based on the following information, provide a clear step-by-step explanation.
+Remember: The answer is already computed and correct. Your job is to EXPLAIN it.
+
+{context}
+"""
+
+# Routes explainer requests to the same prompt-cache shard
+EXPLAINER_PROMPT_CACHE_KEY = "mathai_explainer_v2"
+
 
 class MathExplainer:
     """
@@ -44,66 +64,91 @@ class MathExplainer:
     Explains SymPy results without computing new math.
     """
     
+    # Retrieved chunks included in the prompt (same threshold as citations)
+    MIN_CHUNK_RELEVANCE = 0.5
+    MAX_CONTEXT_CHUNKS = 3
+    
     def __init__(
         self,
-        client: Optional[OpenAI] = None,
-        model: str = "gpt-4o"
+        client: Optional["OpenAI"] = None,
+        model: str = "gpt-4o",
+        async_client: Optional["AsyncOpenAI"] = None
     ):
         # Use LangFuse-wrapped client for automatic token tracking
-        self.client = openai.OpenAI()
+        self.client = client or get_client()
+        self.async_client = async_client or get_openai().AsyncOpenAI()
         self.model = model
     
     def _format_context(self, context: ExplanationContext) -> str:
         """Format the context for the LLM prompt."""
         routing = context.routing_decision
         compute = context.compute_result
-        chunks = context.retrieved_chunks
-        
-        context_parts = [
-            "## Original Query",
-            f'"{context.original_query}"',
-            "",
-            "## Operation Performed",
-            f"- Operation: {routing.operation}",
-            f"- Expression: {routing.expression}",
-            f"- Variable: {routing.variable}",
-        ]
+        
+        # Only the most relevant chunks are worth their prompt tokens
+        chunks = sorted(
+            (c for c in context.retrieved_chunks if c.relevance_score > self.MIN_CHUNK_RELEVANCE),
+            key=lambda c: c.relevance_score,
+            reverse=True
+        )[:self.MAX_CONTEXT_CHUNKS]
+        
+        # Every line is written with its newline; the final one is dropped on return
+        buf = io.StringIO()
+        write = buf.write
+        
+        write(f'## Original Query\n"{context.original_query}"\n\n')
+        write("## Operation Performed\n")
+        write(f"- Operation: {routing.operation}\n")
+        write(f"- Expression: {routing.expression}\n")
+        write(f"- Variable: {routing.variable}\n")
         
         if routing.assumptions:
-            context_parts.append(f"- Assumptions: {', '.join(routing.assumptions)}")
+            write(f"- Assumptions: {', '.join(routing.assumptions)}\n")
         
-        context_parts.extend([
-            "",
-            "## Computed Result (AUTHORITATIVE - from SymPy)",
-            f"- Answer: {compute.result}",
-            f"- LaTeX: {compute.latex_result}",
-        ])
+        write("\n## Computed Result (AUTHORITATIVE - from SymPy)\n")
+        write(f"- Answer: {compute.result}\n")
+        write(f"- LaTeX: {compute.latex_result}\n")
         
         if compute.intermediate_steps:
-            context_parts.append("- Computation steps:")
+            write("- Computation steps:\n")
             for step in compute.intermediate_steps:
-                context_parts.append(f"  • {step}")
+                write(f"  • {step}\n")
         
         if chunks:
-            context_parts.extend([
-                "",
-                "## Retrieved Knowledge (use these to explain)",
-            ])
-            for i, chunk in enumerate(chunks, 1):
-                context_parts.extend([
-                    f"### [{chunk.category}] (relevance: {chunk.relevance_score:.2f})",
-                    chunk.content,
-                    ""
-                ])
-        
-        return "\n".join(context_parts)
+            write("\n## Retrieved Knowledge (use these to explain)\n")
+            for chunk in chunks:
+                write(f"### [{chunk.category}] (relevance: {chunk.relevance_score:.2f})\n")
+                write(chunk.content)
+                write("\n\n")
+        
+        return buf.getvalue()[:-1]
+    
+    def _build_messages(self, context: ExplanationContext) -> List[dict]:
+        """Build the chat messages for an explanation request."""
+        user_prompt = EXPLAINER_USER_PROMPT.format(context=self._format_context(context))
+        
+        return [
+            {"role": "system", "content": EXPLAINER_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _build_request(self, context: ExplanationContext) -> dict:
+        """Build the streaming chat completion request shared by every explain path."""
+        return {
+            "model": self.model,
+            "messages": self._build_messages(context),
+            "temperature": 0.3,
+            "max_tokens": 1024,
+            "stream": True,
+            # extra_body works on every openai>=1.x SDK, not only ones that know the parameter
+            "extra_body": {"prompt_cache_key": EXPLAINER_PROMPT_CACHE_KEY}
+        }
     
     def _format_citations(self, chunks: List[RetrievedChunk]) -> List[str]:
         """Format citations from retrieved chunks."""
         return [
             f"[{chunk.chunk_id}] {chunk.category}: {chunk.source or 'Knowledge Base'}"
             for chunk in chunks
-            if chunk.relevance_score > 0.5
+            if chunk.relevance_score > self.MIN_CHUNK_RELEVANCE
         ]
     
     @observe(name="llm_explanation")
@@ -117,36 +162,21 @@ class MathExplainer:
         Returns:
             A step-by-step explanation string
         """
-        formatted_context = self._format_context(context)
-        
-        user_prompt = f"""Based on the following information, provide a clear step-by-step explanation.
-Remember: The answer is already computed and correct. Your job is to EXPLAIN it.
-
-{formatted_context}
-
-Please explain:
-1. What mathematical operation was needed and why
-2. The step-by-step process to arrive at this answer
-3. Any important rules or techniques used
-4. Potential edge cases or things to watch out for
-"""
+        # Consume the stream so both paths share one request and fallback
+        return "".join(self.explain_stream(context))
+    
+    @observe(name="llm_explanation")
+    async def aexplain(self, context: ExplanationContext) -> str:
+        """
+        Async variant of explain() that does not block the event loop.
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": EXPLAINER_SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1024
-            )
-            
-            return response.choices[0].message.content
+        Args:
+            context: ExplanationContext with query, routing, compute result, and retrieved chunks
             
-        except Exception as e:
-            # Fallback: return a basic explanation using intermediate steps
-            return self._fallback_explanation(context)
+        Returns:
+            A step-by-step explanation string
+        """
+        return "".join([token async for token in self.aexplain_stream(context)])
     
     def _fallback_explanation(self, context: ExplanationContext) -> str:
         """Generate a basic explanation if LLM fails."""
@@ -188,31 +218,8 @@ Please explain:
         Yields:
             Tokens of the explanation as they're generated
         """
-        formatted_context = self._format_context(context)
-        
-        user_prompt = f"""Based on the following information, provide a clear step-by-step explanation.
-Remember: The answer is already computed and correct. Your job is to EXPLAIN it.
-
-{formatted_context}
-
-Please explain:
-1. What mathematical operation was needed and why
-2. The step-by-step process to arrive at this answer
-3. Any important rules or techniques used
-4. Potential edge cases or things to watch out for
-"""
-        
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": EXPLAINER_SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1024,
-                stream=True
-            )
+            response = self.client.chat.completions.create(**self._build_request(context))
             
             for chunk in response:
                 if chunk.choices[0].delta.content:
@@ -222,3 +229,24 @@ Please explain:
             # Fallback: yield the basic explanation
             yield self._fallback_explanation(context)
 
+    
+    async def aexplain_stream(self, context: ExplanationContext) -> AsyncGenerator[str, None]:
+        """
+        Async variant of explain_stream() that does not block the event loop.
+        
+        Args:
+            context: ExplanationContext with query, routing, compute result, and retrieved chunks
+            
+        Yields:
+            Tokens of the explanation as they're generated
+        """
+        try:
+            response = await self.async_client.chat.completions.create(**self._build_request(context))
+            
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                    
+        except Exception as e:
+            # Fallback: yield the basic explanation
+            yield self._fallback_explanation(context)
@@ -10,36 +10,26 @@ Provides end-to-end tracing with spans for:
 Logs prompt versions, token usage, latency, retrieved chunk IDs, and outputs.
 """
 import os
+import inspect
+from importlib.util import find_spec
 from typing import Optional, Callable, Any
 from functools import wraps
 from contextlib import contextmanager
 import time
 
-# Try to import langfuse
-try:
-    from langfuse import Langfuse, observe, get_client
-    LANGFUSE_AVAILABLE = True
-    
-    def update_current_span(**kwargs):
-        """Helper to update current span with new langfuse API."""
-        try:
-            get_client().update_current_span(**kwargs)
-        except Exception:
-            pass
-            
-except ImportError:
-    LANGFUSE_AVAILABLE = False
-    
-    # Create no-op decorators if langfuse not available
-    def observe(*args, **kwargs):
-        def decorator(func):
-            return func
-        if len(args) == 1 and callable(args[0]):
-            return args[0]
-        return decorator
-    
-    def update_current_span(**kwargs):
-        """No-op when langfuse not available."""
+# langfuse is optional and slow to import (~0.4s), so it is only imported
+# once tracing is actually configured or used
+LANGFUSE_AVAILABLE = find_spec("langfuse") is not None
+
+
+def update_current_span(**kwargs):
+    """Helper to update current span with new langfuse API (no-op without langfuse)."""
+    if not LANGFUSE_AVAILABLE:
+        return
+    try:
+        from langfuse import get_client
+        get_client().update_current_span(**kwargs)
+    except Exception:
         pass
 
 
@@ -69,6 +59,7 @@ class MathAIInstrumentation:
         
         if all(os.environ.get(var) for var in required_vars):
             try:
+                from langfuse import Langfuse
                 self.langfuse = Langfuse(
                     public_key=os.environ.get("LANGFUSE_PUBLIC_KEY"),
                     secret_key=os.environ.get("LANGFUSE_SECRET_KEY"),
@@ -92,9 +83,8 @@ class MathAIInstrumentation:
                 # Your code here
                 pass
         """
-        start_time = time.perf_counter()
-        
         if self.enabled and self.langfuse:
+            start_ns = time.monotonic_ns()
             trace = self.langfuse.trace(
                 name=name,
                 metadata=metadata
@@ -102,7 +92,7 @@ class MathAIInstrumentation:
             try:
                 yield trace
             finally:
-                latency_ms = (time.perf_counter() - start_time) * 1000
+                latency_ms = (time.monotonic_ns() - start_ns) / 1e6
                 trace.update(metadata={"latency_ms": latency_ms, **metadata})
         else:
             yield None
@@ -112,9 +102,8 @@ class MathAIInstrumentation:
         """
         Context manager for creating a span within a trace.
         """
-        start_time = time.perf_counter()
-        
         if self.enabled and parent_trace:
+            start_ns = time.monotonic_ns()
             span = parent_trace.span(
                 name=name,
                 metadata=metadata
@@ -122,7 +111,7 @@ class MathAIInstrumentation:
             try:
                 yield span
             finally:
-                latency_ms = (time.perf_counter() - start_time) * 1000
+                latency_ms = (time.monotonic_ns() - start_ns) / 1e6
                 span.end(metadata={"latency_ms": latency_ms, **metadata})
         else:
             yield None
@@ -248,6 +237,54 @@ class MathAIInstrumentation:
 instrumentation = MathAIInstrumentation()
 
 
+def observe(*args, **observe_kwargs):
+    """
+    LangFuse `@observe` that costs nothing when tracing is off.
+    
+    Without langfuse installed the function is returned unchanged. Otherwise
+    each call checks `instrumentation.enabled` first and only builds a span
+    when tracing is configured. The LangFuse wrapper itself is created on the
+    first traced call, so decorating a function does not import langfuse.
+    
+    Usage:
+        @observe(name="my_operation")
+        async def my_operation(x):
+            ...
+    """
+    def decorator(func: Callable) -> Callable:
+        if not LANGFUSE_AVAILABLE:
+            return func
+        
+        observed = None
+        
+        def get_observed() -> Callable:
+            nonlocal observed
+            if observed is None:
+                from langfuse import observe as langfuse_observe
+                observed = langfuse_observe(**observe_kwargs)(func)
+            return observed
+        
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not instrumentation.enabled:
+                    return await func(*args, **kwargs)
+                return await get_observed()(*args, **kwargs)
+            return async_wrapper
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not instrumentation.enabled:
+                return func(*args, **kwargs)
+            return get_observed()(*args, **kwargs)
+        return wrapper
+    
+    # Support bare @observe as well as @observe(...)
+    if len(args) == 1 and callable(args[0]):
+        return decorator(args[0])
+    return decorator
+
+
 def traced(name: Optional[str] = None, capture_input: bool = True, capture_output: bool = True):
     """
     Decorator for tracing function calls.
@@ -262,19 +299,21 @@ def traced(name: Optional[str] = None, capture_input: bool = True, capture_outpu
         
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time.perf_counter()
+            # Fast path: no timers or stringification when tracing is off
+            if not instrumentation.enabled:
+                return func(*args, **kwargs)
             
-            if instrumentation.enabled:
-                update_current_span(
-                    name=trace_name,
-                    input={"args": str(args), "kwargs": str(kwargs)} if capture_input else None
-                )
+            start_ns = time.monotonic_ns()
+            update_current_span(
+                name=trace_name,
+                input={"args": str(args), "kwargs": str(kwargs)} if capture_input else None
+            )
             
             try:
                 result = func(*args, **kwargs)
                 
-                if instrumentation.enabled and capture_output:
-                    latency_ms = (time.perf_counter() - start_time) * 1000
+                if capture_output:
+                    latency_ms = (time.monotonic_ns() - start_ns) / 1e6
                     update_current_span(
                         output=str(result)[:500] if result else None,
                         metadata={"latency_ms": latency_ms}
@@ -283,11 +322,10 @@ def traced(name: Optional[str] = None, capture_input: bool = True, capture_outpu
                 return result
                 
             except Exception as e:
-                if instrumentation.enabled:
-                    update_current_span(
-                        level="ERROR",
-                        metadata={"error": str(e)}
-                    )
+                update_current_span(
+                    level="ERROR",
+                    metadata={"error": str(e)}
+                )
                 raise
         
         return wrapper
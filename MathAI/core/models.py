@@ -65,6 +65,7 @@ class RetrievedChunk(BaseModel):
     category: str = Field(description="Category: rule_intuition, method_heuristic, pitfall, engine_note")
     relevance_score: float = Field(description="Similarity score from vector search")
     source: Optional[str] = Field(default=None, description="Source reference")
+    citation: Optional[str] = Field(default=None, description="Pre-formatted citation string")
 
 
 class ExplanationContext(BaseModel):
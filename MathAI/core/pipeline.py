@@ -10,148 +10,575 @@ Orchestrates the complete workflow:
 
 All steps are instrumented with LangFuse.
 Includes caching for common queries.
+
+Models built here from pipeline-internal data use model_construct() and skip
+validation; validation happens where data enters (router LLM output, API requests).
 """
+import os
 import time
+import uuid
 import hashlib
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Dict, Any
-from functools import lru_cache
-from openai import OpenAI
-from langfuse import Langfuse, observe, get_client
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, Dict, Any, Iterator, Tuple
+from functools import cached_property, lru_cache
+import httpx
 
 from .models import (
     RoutingDecision, ComputeResult, ExplanationContext,
     MathResponse, TraceMetadata, RetrievedChunk
 )
-from .router import MathRouter
-from .compute import SymPyEngine
+from .router import MathRouter, RouterBatcher, normalize_query
+from .compute import SymPyEngine, compute_in_worker
 from .rag import MathRAG
 from .explainer import MathExplainer
+from .clients import get_client, get_openai
+from .cache import RedisResponseCache, REDIS_AVAILABLE
+from .instrumentation import (
+    LANGFUSE_AVAILABLE, instrumentation, observe, update_current_span
+)
+
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI
 
-# Simple in-memory cache for responses
-_response_cache: Dict[str, MathResponse] = {}
+@dataclass
+class _CacheEntry:
+    """A cached response plus its pre-serialized /solve/stream event payloads."""
+    response: MathResponse
+    stream_payloads: Optional[Tuple[str, ...]] = None
+
+
+# In-memory LRU cache for responses
+_response_cache: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+_response_cache_lock = threading.Lock()
 _CACHE_MAX_SIZE = 100
 
+# Short-lived negative cache for failures that repeat for the same input, so
+# a resubmitted bad query skips the router and compute. Routing errors are
+# usually transient (LLM API) and are not cached.
+_failure_cache: "OrderedDict[str, Tuple[float, MathResponse]]" = OrderedDict()
+_FAILURE_CACHE_TTL_SECONDS = 60
+_FAILURE_CACHE_MAX_SIZE = 256
+_CACHEABLE_FAILURES = frozenset({"parse_error", "computation_error"})
+
+# Second tier: ComputeResults keyed by the routing decision, so paraphrases
+# that miss the response cache still skip the compute-pool round trip.
+# Entries are a few hundred bytes each.
+_compute_cache: "OrderedDict[tuple, ComputeResult]" = OrderedDict()
+_compute_cache_lock = threading.Lock()
+_COMPUTE_CACHE_MAX_SIZE = 512
+
+# Thread pool shared by every pipeline in the process for compute when no
+# process pool is configured, rather than a default executor per event loop.
+_shared_executor: Optional[ThreadPoolExecutor] = None
+_shared_executor_lock = threading.Lock()
+
+
+async def _timed(awaitable):
+    """Await a stage and return (result, perf_counter() when it finished)."""
+    result = await awaitable
+    return result, time.perf_counter()
+
+
+def _get_shared_executor() -> ThreadPoolExecutor:
+    """Return the process-wide compute thread pool, creating it on first use."""
+    global _shared_executor
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(
+                max_workers=min(32, (os.cpu_count() or 1) * 4),
+                thread_name_prefix="mathai-compute"
+            )
+    return _shared_executor
+
 
 class MathPipeline:
     """
     Main orchestrator for the MathAI v2 pipeline.
     Coordinates all components and manages the end-to-end flow.
-    Features: parallel execution, caching, and streaming support.
+    Features: async concurrent execution, caching, and streaming support.
     """
     
     def __init__(
         self,
-        openai_client: Optional[OpenAI] = None,
+        openai_client: Optional["OpenAI"] = None,
         router_model: str = "gpt-4o-mini",
         explainer_model: str = "gpt-4o-mini",
         langfuse_enabled: bool = True,
-        cache_enabled: bool = True
+        cache_enabled: bool = True,
+        redis_url: Optional[str] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        router_semantic_threshold: Optional[float] = None,
+        router_cache_path: Optional[str] = None
     ):
-        self.client = openai_client or OpenAI()
+        self.client = openai_client or get_client()
+        
+        # Pass an HTTP/2 httpx client to multiplex concurrent LLM calls
+        self.http_client = http_client
         
-        # Initialize components
-        self.router = MathRouter(client=self.client, model=router_model)
-        self.compute_engine = SymPyEngine()
-        self.rag = MathRAG(openai_client=self.client)
-        self.explainer = MathExplainer(client=self.client, model=explainer_model)
+        # Components are built on first use (see the properties below)
+        self.router_model = router_model
+        self.router_semantic_threshold = router_semantic_threshold
+        self.router_cache_path = router_cache_path
+        self.explainer_model = explainer_model
         
-        # Thread pool for parallel execution
-        self.executor = ThreadPoolExecutor(max_workers=2)
+        # Executor for SymPy work. None uses the shared module thread pool;
+        # set a ProcessPoolExecutor to run compute in parallel across cores.
+        self.compute_pool: Optional[Executor] = None
         
-        # Caching
+        # Caching (in-process, plus Redis shared across workers if configured)
         self.cache_enabled = cache_enabled
+        self.shared_cache = None
+        if cache_enabled and redis_url and REDIS_AVAILABLE:
+            self.shared_cache = RedisResponseCache(redis_url)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
+        # Event loop for the sync wrappers, created on first use
+        self._sync_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_loop_lock = threading.Lock()
         
         # LangFuse setup
-        self.langfuse_enabled = langfuse_enabled
-        if langfuse_enabled:
+        self.langfuse_enabled = langfuse_enabled and LANGFUSE_AVAILABLE
+        self.langfuse = None
+        if self.langfuse_enabled:
             try:
+                from langfuse import Langfuse
                 self.langfuse = Langfuse()
             except Exception:
                 self.langfuse = None
                 self.langfuse_enabled = False
     
+    # Components are created lazily so a process that only routes or only
+    # computes never opens the vector store or builds unused clients
+    
+    @cached_property
+    def async_client(self) -> "AsyncOpenAI":
+        # One async client (and connection pool) shared by router and explainer
+        return get_openai().AsyncOpenAI(http_client=self.http_client)
+    
+    @cached_property
+    def router(self) -> MathRouter:
+        return MathRouter(
+            client=self.client,
+            model=self.router_model,
+            async_client=self.async_client,
+            semantic_threshold=self.router_semantic_threshold,
+            cache_path=self.router_cache_path
+        )
+    
+    @cached_property
+    def router_batcher(self) -> RouterBatcher:
+        return RouterBatcher(self.router)
+    
+    @cached_property
+    def compute_engine(self) -> SymPyEngine:
+        return SymPyEngine()
+    
+    @cached_property
+    def rag(self) -> MathRAG:
+        return MathRAG(openai_client=self.client)
+    
+    @cached_property
+    def explainer(self) -> MathExplainer:
+        return MathExplainer(
+            client=self.client, model=self.explainer_model, async_client=self.async_client
+        )
+    
     def _get_cache_key(self, query: str) -> str:
-        """Generate a cache key from the query."""
-        return hashlib.md5(query.lower().strip().encode()).hexdigest()
+        """Generate a cache key from the normalized query."""
+        # Same normalization as the route cache, plus trailing "?" / "." so that
+        # "Differentiate  x^2?" and "differentiate x^2" share an entry. "!" is
+        # kept because it is the factorial operator.
+        normalized = normalize_query(query).rstrip("?. ")
+        # blake2b beats md5 on short strings; hex so the key also works in Redis
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+    
+    def _get_cache_entry(self, query: str) -> Optional[_CacheEntry]:
+        """Look up a cached entry and mark it as recently used."""
+        cache_key = self._get_cache_key(query)
+        with _response_cache_lock:
+            entry = _response_cache.get(cache_key)
+            if entry is not None:
+                _response_cache.move_to_end(cache_key)
+        return entry
     
     def _get_cached_response(self, query: str) -> Optional[MathResponse]:
-        """Check if we have a cached response."""
+        """Check if we have a cached response (or a recent cached failure)."""
         if not self.cache_enabled:
             return None
+        entry = self._get_cache_entry(query)
+        if entry:
+            return entry.response
+        return self._get_cached_failure(query)
+    
+    def _get_cached_failure(self, query: str) -> Optional[MathResponse]:
+        """Return a failed response cached within the TTL, dropping it once expired."""
         cache_key = self._get_cache_key(query)
-        return _response_cache.get(cache_key)
+        with _response_cache_lock:
+            cached = _failure_cache.get(cache_key)
+            if cached is None:
+                return None
+            stored_at, response = cached
+            if time.monotonic() - stored_at >= _FAILURE_CACHE_TTL_SECONDS:
+                del _failure_cache[cache_key]
+                return None
+            return response
+    
+    def _get_cached_stream_payloads(self, query: str) -> Optional[Tuple[str, ...]]:
+        """Return the pre-serialized stream events for a cached response, if built."""
+        if not self.cache_enabled:
+            return None
+        entry = self._get_cache_entry(query)
+        return entry.stream_payloads if entry else None
+    
+    def _set_cached_stream_payloads(self, query: str, payloads: Tuple[str, ...]):
+        """Attach pre-serialized stream events to an already cached response."""
+        entry = self._get_cache_entry(query)
+        if entry:
+            entry.stream_payloads = payloads
     
-    def _cache_response(self, query: str, response: MathResponse):
-        """Cache a successful response."""
-        if not self.cache_enabled or not response.success:
+    def _cache_response(
+        self,
+        query: str,
+        response: MathResponse,
+        stream_payloads: Optional[Tuple[str, ...]] = None
+    ):
+        """Cache a successful response (and optionally its stream events)."""
+        if not self.cache_enabled:
             return
-        # Limit cache size
-        if len(_response_cache) >= _CACHE_MAX_SIZE:
-            # Remove oldest entry (simple FIFO)
-            oldest_key = next(iter(_response_cache))
-            del _response_cache[oldest_key]
         cache_key = self._get_cache_key(query)
-        _response_cache[cache_key] = response
+        if not response.success:
+            if response.error_type in _CACHEABLE_FAILURES:
+                with _response_cache_lock:
+                    _failure_cache[cache_key] = (time.monotonic(), response)
+                    if len(_failure_cache) > _FAILURE_CACHE_MAX_SIZE:
+                        _failure_cache.popitem(last=False)
+            return
+        with _response_cache_lock:
+            _response_cache[cache_key] = _CacheEntry(response, stream_payloads)
+            _response_cache.move_to_end(cache_key)
+            # Evict the least recently used entry
+            if len(_response_cache) > _CACHE_MAX_SIZE:
+                _response_cache.popitem(last=False)
+    
+    async def _aget_cached_response(self, query: str) -> Optional[MathResponse]:
+        """Check the in-process cache, then the shared Redis cache."""
+        cached = self._get_cached_response(query)
+        if cached or not self.shared_cache:
+            return cached
+        cached = await self.shared_cache.get(self._get_cache_key(query))
+        if cached:
+            # Promote to the in-process cache for subsequent hits
+            self._cache_response(query, cached)
+        return cached
+    
+    async def _acache_response(
+        self,
+        query: str,
+        response: MathResponse,
+        stream_payloads: Optional[Tuple[str, ...]] = None
+    ):
+        """Cache a successful response locally and in the shared cache."""
+        self._cache_response(query, response, stream_payloads)
+        if self.shared_cache and self.cache_enabled and response.success:
+            await self.shared_cache.set(self._get_cache_key(query), response)
+    
+    async def acompute(self, routing: RoutingDecision, steps: bool = True) -> ComputeResult:
+        """
+        Run the SymPy computation off the event loop.
+        
+        Args:
+            routing: The RoutingDecision from the router
+            steps: Set to False to skip intermediate_steps (nothing explains them)
+            
+        Returns:
+            ComputeResult from the compute engine
+        """
+        # Results with steps also serve callers that do not need them
+        cache_key = (routing.operation, routing.expression, routing.variable, routing.solve_for)
+        with _compute_cache_lock:
+            for lookup in ((cache_key, True),) if steps else ((cache_key, True), (cache_key, False)):
+                cached = _compute_cache.get(lookup)
+                if cached is not None:
+                    _compute_cache.move_to_end(lookup)
+                    return cached.model_copy(deep=True)
+        
+        loop = asyncio.get_running_loop()
+        if self.compute_pool is not None:
+            # Worker processes keep their own engine; only the routing is pickled
+            result = await loop.run_in_executor(self.compute_pool, compute_in_worker, routing, steps)
+        else:
+            result = await loop.run_in_executor(
+                _get_shared_executor(), self.compute_engine.compute, routing, steps
+            )
+        
+        with _compute_cache_lock:
+            _compute_cache[(cache_key, steps)] = result
+            if len(_compute_cache) > _COMPUTE_CACHE_MAX_SIZE:
+                _compute_cache.popitem(last=False)
+        return result.model_copy(deep=True)
+    
+    def _run_sync(self, coro):
+        """Run a coroutine to completion on this pipeline's own event loop."""
+        # asyncio.run() closes its loop after every call, which would strand
+        # the shared async client's pooled connections on a dead loop
+        with self._sync_loop_lock:
+            if self._sync_loop is None:
+                self._sync_loop = asyncio.new_event_loop()
+            return self._sync_loop.run_until_complete(coro)
+    
+    async def aclose(self):
+        """Stop the router batcher's background tasks on the running loop."""
+        if "router_batcher" in self.__dict__:
+            await self.router_batcher.aclose()
+    
+    def close(self):
+        """Cancel background tasks left on the sync event loop and close it."""
+        with self._sync_loop_lock:
+            loop, self._sync_loop = self._sync_loop, None
+            if loop is None:
+                return
+            loop.run_until_complete(self.aclose())
+            pending = asyncio.all_tasks(loop)
+            if pending:
+                for task in pending:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+    
+    def process(self, query: str, explain: bool = True) -> MathResponse:
+        """
+        Process a mathematical query through the full pipeline.
+        
+        Synchronous wrapper around aprocess() for callers without a
+        running event loop (scripts, tests). Calls share one event loop
+        per pipeline, so pooled LLM connections stay usable between them.
+        
+        Args:
+            query: The user's natural language math query
+            explain: Set to False to skip retrieval and the explanation
+            
+        Returns:
+            MathResponse with answer, explanation, and metadata
+        """
+        return self._run_sync(self.aprocess(query, explain=explain))
+    
+    def process_stream(self, query: str) -> Iterator[dict]:
+        """
+        Process a query, yielding the answer as soon as it is computed and
+        then the explanation as it is generated.
+        
+        Args:
+            query: The user's natural language math query
+            
+        Yields:
+            {"stage": "answer", "answer", "latex"} once compute finishes, then
+            {"stage": "delta", "text"} per explanation chunk, then
+            {"stage": "done", "citations"}. Failures yield a single
+            {"stage": "error", "error", "error_type"} instead.
+        """
+        cached = self._get_cached_response(query)
+        if cached and not cached.success:
+            # Recent parse/computation failure, served from the failure cache
+            yield {"stage": "error", "error": cached.error, "error_type": cached.error_type}
+            return
+        if cached:
+            yield {"stage": "answer", "answer": cached.answer, "latex": cached.latex_answer}
+            if cached.explanation:
+                yield {"stage": "delta", "text": cached.explanation}
+            yield {"stage": "done", "citations": cached.citations}
+            return
+        
+        try:
+            routing = self.router.route(query)
+        except Exception as e:
+            yield {"stage": "error", "error": f"Routing failed: {str(e)}", "error_type": "routing_error"}
+            return
+        
+        # Retrieval runs in the background while SymPy computes
+        retrieval = _get_shared_executor().submit(self.rag.retrieve, routing, 5, 0.5)
+        compute_result = self.compute_engine.compute(routing)
+        try:
+            retrieved_chunks = retrieval.result()
+        except Exception:
+            retrieved_chunks = []
+        
+        if not compute_result.success:
+            self._cache_response(query, MathResponse.model_construct(
+                success=False,
+                query=query,
+                operation=routing.operation,
+                error=compute_result.error,
+                error_type=compute_result.error_type
+            ))
+            yield {"stage": "error", "error": compute_result.error, "error_type": compute_result.error_type}
+            return
+        
+        yield {"stage": "answer", "answer": compute_result.result, "latex": compute_result.latex_result}
+        
+        explanation_context = ExplanationContext.model_construct(
+            original_query=query,
+            routing_decision=routing,
+            compute_result=compute_result,
+            retrieved_chunks=retrieved_chunks
+        )
+        explanation_buffer = []
+        for chunk in self.explainer.explain_stream(explanation_context):
+            explanation_buffer.append(chunk)
+            yield {"stage": "delta", "text": chunk}
+        
+        # Cache before "done": consumers usually stop iterating at that event
+        citations = [chunk.citation for chunk in retrieved_chunks]
+        self._cache_response(query, MathResponse.model_construct(
+            success=True,
+            query=query,
+            operation=routing.operation,
+            answer=compute_result.result,
+            latex_answer=compute_result.latex_result,
+            explanation="".join(explanation_buffer),
+            assumptions=routing.assumptions,
+            citations=citations
+        ))
+        yield {"stage": "done", "citations": citations}
     
     @observe(name="math_pipeline")
-    def process(self, query: str) -> MathResponse:
+    async def aprocess(self, query: str, explain: bool = True) -> MathResponse:
         """
         Process a mathematical query through the full pipeline.
-        Uses caching and parallel execution for performance.
+        Uses caching and concurrent execution for performance.
         
         Args:
             query: The user's natural language math query
+            explain: Set to False to skip retrieval and the explanation
+                (route -> compute -> return)
             
         Returns:
             MathResponse with answer, explanation, and metadata
         """
         # Check cache first
-        cached = self._get_cached_response(query)
+        cached = await self._aget_cached_response(query)
         if cached:
+            if not explain:
+                return cached.model_copy(update={"explanation": None, "citations": []})
             return cached
         
-        timings = {}
+        # Answer-only responses skip the LLM explanation and are never cached
+        if not explain:
+            response, _ = await self._execute(query, explain=False)
+            return response
+        
+        if not self.cache_enabled:
+            response, _ = await self._execute(query)
+            return response
+        
+        # Single-flight: identical concurrent queries share one pipeline run
+        cache_key = self._get_cache_key(query)
+        inflight = self._inflight.get(cache_key)
+        if inflight:
+            response = await asyncio.shield(inflight)
+            if response:
+                return response
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        lock_held = False
+        response = None
+        try:
+            if self.shared_cache:
+                # Another worker may already be computing this query
+                lock_held = await self.shared_cache.acquire(cache_key)
+                if not lock_held:
+                    response = await self.shared_cache.wait_for(cache_key)
+            if response is None:
+                response, _ = await self._execute(query)
+            return response
+        finally:
+            # Waiters that receive None fall back to computing themselves
+            future.set_result(response)
+            self._inflight.pop(cache_key, None)
+            if lock_held:
+                await self.shared_cache.release(cache_key)
+    
+    async def _execute(
+        self,
+        query: str,
+        explain: bool = True,
+        collect_trace: bool = False
+    ) -> Tuple[MathResponse, Optional[TraceMetadata]]:
+        """
+        Run routing, compute, retrieval and explanation for a cache miss.
+        
+        Shared by aprocess() and process_with_trace() so both get concurrent
+        compute and retrieval.
+        
+        Args:
+            query: The user's natural language math query
+            explain: Set to False to skip retrieval and the explanation
+            collect_trace: Also return per-stage TraceMetadata
+            
+        Returns:
+            Tuple of (MathResponse, TraceMetadata or None). The trace is None
+            unless requested, and when routing or compute raised.
+        """
+        # One timestamp per finished stage; turned into timings only when
+        # they are reported
+        t0 = time.perf_counter()
         
         # Step 1: Route the query
-        start = time.perf_counter()
         try:
-            routing = self.router.route(query)
-            timings["routing"] = (time.perf_counter() - start) * 1000
+            routing = await self.router_batcher.route(query)
+            routed = time.perf_counter()
         except Exception as e:
-            return MathResponse(
+            return MathResponse.model_construct(
                 success=False,
                 query=query,
                 operation="unknown",
                 error=f"Routing failed: {str(e)}",
                 error_type="routing_error"
-            )
+            ), None
         
-        # Step 2 & 3: Run compute and RAG retrieval IN PARALLEL
-        start = time.perf_counter()
+        # Step 2 & 3: Run compute and RAG retrieval CONCURRENTLY
         try:
-            # Submit both tasks to thread pool
-            compute_future = self.executor.submit(self.compute_engine.compute, routing)
-            rag_future = self.executor.submit(self.rag.retrieve, routing, 5)
-            
-            # Wait for both to complete
-            compute_result = compute_future.result()
-            retrieved_chunks = rag_future.result()
-            
-            timings["compute_and_retrieval"] = (time.perf_counter() - start) * 1000
+            # SymPy is blocking, so it runs off the event loop
+            if explain:
+                (compute_result, computed), (retrieved_chunks, retrieved) = await asyncio.gather(
+                    _timed(self.acompute(routing)),
+                    _timed(self.rag.aretrieve(routing, 5, min_score=0.5))
+                )
+            else:
+                # Nothing explains the steps, so the engine skips building them
+                compute_result, computed = await _timed(self.acompute(routing, steps=False))
+                retrieved_chunks, retrieved = [], computed
         except Exception as e:
-            return MathResponse(
+            return MathResponse.model_construct(
                 success=False,
                 query=query,
                 operation=routing.operation,
                 error=f"Computation failed: {str(e)}",
                 error_type="computation_error"
+            ), None
+        
+        def trace(explained: float) -> Optional[TraceMetadata]:
+            if not collect_trace:
+                return None
+            return TraceMetadata(
+                trace_id=str(uuid.uuid4()),
+                routing_latency_ms=(routed - t0) * 1000,
+                compute_latency_ms=(computed - routed) * 1000,
+                retrieval_latency_ms=(retrieved - routed) * 1000,
+                explanation_latency_ms=(explained - max(computed, retrieved)) * 1000,
+                total_latency_ms=(explained - t0) * 1000,
+                retrieved_chunk_ids=[c.chunk_id for c in retrieved_chunks]
             )
         
-        # If computation failed, return early with the error
+        # If computation failed, return early with the error (SymPy failures
+        # repeat for the same input, so they go into the failure cache)
         if not compute_result.success:
-            return MathResponse(
+            response = MathResponse.model_construct(
                 success=False,
                 query=query,
                 operation=routing.operation,
@@ -161,50 +588,62 @@ class MathPipeline:
                 error_type=compute_result.error_type,
                 assumptions=routing.assumptions
             )
+            self._cache_response(query, response)
+            return response, trace(max(computed, retrieved))
+        
+        # Answer-only fast path
+        if not explain:
+            return MathResponse.model_construct(
+                success=True,
+                query=query,
+                operation=routing.operation,
+                answer=compute_result.result,
+                latex_answer=compute_result.latex_result,
+                assumptions=routing.assumptions
+            ), trace(computed)
         
         # Step 4: Generate explanation
-        start = time.perf_counter()
         try:
-            explanation_context = ExplanationContext(
+            explanation_context = ExplanationContext.model_construct(
                 original_query=query,
                 routing_decision=routing,
                 compute_result=compute_result,
                 retrieved_chunks=retrieved_chunks
             )
-            explanation = self.explainer.explain(explanation_context)
-            timings["explanation"] = (time.perf_counter() - start) * 1000
+            explanation = await self.explainer.aexplain(explanation_context)
         except Exception as e:
             # Non-fatal: return result without explanation
             explanation = f"(Explanation unavailable: {str(e)})"
-            timings["explanation"] = 0
+        explained = time.perf_counter()
         
         # Step 5: Assemble response
-        total_time = sum(timings.values())
-        
-        citations = [
-            f"[{chunk.chunk_id}] {chunk.category}"
-            for chunk in retrieved_chunks
-            if chunk.relevance_score > 0.5
-        ]
+        # Retrieval already dropped low-relevance chunks
+        citations = [chunk.citation for chunk in retrieved_chunks]
         
-        # Update LangFuse with metadata
-        if self.langfuse_enabled:
-            try:
-                get_client().update_current_span(
-                    metadata={
-                        "operation": routing.operation,
-                        "expression": routing.expression,
-                        "variable": routing.variable,
-                        "timings_ms": timings,
-                        "retrieved_chunk_ids": [c.chunk_id for c in retrieved_chunks],
-                        "confidence": routing.confidence,
-                        "cached": False
-                    }
-                )
-            except Exception:
-                pass  # LangFuse errors should not break the pipeline
+        # Update LangFuse with metadata. This only sets attributes on the
+        # in-process span (the exporter ships them in the background), and it
+        # needs this task's span context, so it stays inline.
+        if self.langfuse_enabled and instrumentation.enabled:
+            computed_and_retrieved = max(computed, retrieved)
+            timings = {
+                "routing": (routed - t0) * 1000,
+                "compute_and_retrieval": (computed_and_retrieved - routed) * 1000,
+                "explanation": (explained - computed_and_retrieved) * 1000,
+                "total": (explained - t0) * 1000
+            }
+            update_current_span(
+                metadata={
+                    "operation": routing.operation,
+                    "expression": routing.expression,
+                    "variable": routing.variable,
+                    "timings_ms": timings,
+                    "retrieved_chunk_ids": [c.chunk_id for c in retrieved_chunks],
+                    "confidence": routing.confidence,
+                    "cached": False
+                }
+            )
         
-        response = MathResponse(
+        response = MathResponse.model_construct(
             success=True,
             query=query,
             operation=routing.operation,
@@ -216,77 +655,24 @@ class MathPipeline:
         )
         
         # Cache the successful response
-        self._cache_response(query, response)
+        await self._acache_response(query, response)
         
-        return response
+        return response, trace(explained)
     
-    def process_with_trace(self, query: str) -> tuple[MathResponse, Optional[TraceMetadata]]:
+    def process_with_trace(self, query: str) -> Tuple[MathResponse, Optional[TraceMetadata]]:
         """
         Process a query and return both the response and trace metadata.
         
+        Runs the same concurrent path as process(), bypassing the response
+        cache so the timings describe a real run.
+        
         Args:
             query: The user's natural language math query
             
         Returns:
             Tuple of (MathResponse, TraceMetadata)
         """
-        import uuid
-        
-        trace_id = str(uuid.uuid4())
-        timings = {}
-        
-        # Route
-        start = time.perf_counter()
-        routing = self.router.route(query)
-        timings["routing"] = (time.perf_counter() - start) * 1000
-        
-        # Compute
-        start = time.perf_counter()
-        compute_result = self.compute_engine.compute(routing)
-        timings["compute"] = (time.perf_counter() - start) * 1000
-        
-        # Retrieve
-        start = time.perf_counter()
-        retrieved_chunks = self.rag.retrieve(routing)
-        timings["retrieval"] = (time.perf_counter() - start) * 1000
-        
-        # Explain
-        start = time.perf_counter()
-        explanation_context = ExplanationContext(
-            original_query=query,
-            routing_decision=routing,
-            compute_result=compute_result,
-            retrieved_chunks=retrieved_chunks
-        )
-        explanation = self.explainer.explain(explanation_context)
-        timings["explanation"] = (time.perf_counter() - start) * 1000
-        
-        total_time = sum(timings.values())
-        
-        response = MathResponse(
-            success=compute_result.success,
-            query=query,
-            operation=routing.operation,
-            answer=compute_result.result,
-            latex_answer=compute_result.latex_result,
-            explanation=explanation if compute_result.success else None,
-            assumptions=routing.assumptions,
-            citations=[c.chunk_id for c in retrieved_chunks if c.relevance_score > 0.5],
-            error=compute_result.error,
-            error_type=compute_result.error_type
-        )
-        
-        metadata = TraceMetadata(
-            trace_id=trace_id,
-            routing_latency_ms=timings["routing"],
-            compute_latency_ms=timings["compute"],
-            retrieval_latency_ms=timings["retrieval"],
-            explanation_latency_ms=timings["explanation"],
-            total_latency_ms=total_time,
-            retrieved_chunk_ids=[c.chunk_id for c in retrieved_chunks]
-        )
-        
-        return response, metadata
+        return self._run_sync(self._execute(query, collect_trace=True))
     
     def initialize(self):
         """Initialize the pipeline (e.g., populate knowledge base)."""
@@ -8,25 +8,64 @@ Retrieves explanation-grade material from a vector database:
 - Symbolic-engine behavior notes
 """
 import os
-import json
-from typing import List, Optional
+import asyncio
+import logging
+import threading
+from importlib.util import find_spec
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from pathlib import Path
-from langfuse import observe
+import numpy as np
 from .models import RoutingDecision, RetrievedChunk
+from .instrumentation import observe
 
-# Try importing vector store dependencies
-try:
-    from chromadb import PersistentClient
-    from chromadb.utils import embedding_functions
-    CHROMA_AVAILABLE = True
-except ImportError:
-    CHROMA_AVAILABLE = False
-
-try:
+if TYPE_CHECKING:
     from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+
+log = logging.getLogger("mathai")
+
+# Vector store dependencies are optional and slow to import (chromadb ~0.3s),
+# so they are imported when the vector store is first opened
+CHROMA_AVAILABLE = find_spec("chromadb") is not None
+OPENAI_AVAILABLE = find_spec("openai") is not None
+
+
+# Search query embeddings keyed by (embedding model, operation, variable),
+# stored as contiguous float32 arrays (6 KB per 1536-dim vector)
+_query_embedding_cache: "OrderedDict[Tuple[str, str, Optional[str]], np.ndarray]" = OrderedDict()
+_query_embedding_lock = threading.Lock()
+_QUERY_EMBEDDING_CACHE_MAX_SIZE = 256
+
+
+# Retrieval query per operation. The expression is left out: the knowledge
+# base holds general rules and pitfalls, and an expression-free query lets
+# the embedding be cached.
+_QUERY_TEMPLATES = {
+    "differentiate": (
+        "How to differentiate mathematical expressions "
+        "Rules and methods for differentiate "
+        "derivative rules chain rule product rule "
+        "differentiate with respect to {variable}"
+    ),
+    "integrate": (
+        "How to integrate mathematical expressions "
+        "Rules and methods for integrate "
+        "integration techniques substitution parts "
+        "integrate with respect to {variable}"
+    ),
+    "simplify": (
+        "How to simplify mathematical expressions "
+        "Rules and methods for simplify "
+        "simplification algebraic manipulation "
+        "factoring expanding combining like terms"
+    ),
+    "solve": (
+        "How to solve mathematical expressions "
+        "Rules and methods for solve "
+        "solving equations finding roots "
+        "algebraic solution methods"
+    ),
+}
 
 
 class MathRAG:
@@ -53,10 +92,13 @@ class MathRAG:
             self._init_chroma()
         else:
             self.collection = None
-            print("Warning: ChromaDB not available. RAG will use fallback mode.")
+            log.warning("ChromaDB not available, RAG will use fallback mode")
     
     def _init_chroma(self):
         """Initialize ChromaDB with OpenAI embeddings."""
+        from chromadb import PersistentClient
+        from chromadb.utils import embedding_functions
+        
         os.makedirs(self.persist_directory, exist_ok=True)
         
         self.client = PersistentClient(path=self.persist_directory)
@@ -102,44 +144,36 @@ class MathRAG:
     
     def _build_query(self, routing: RoutingDecision) -> str:
         """Build a search query from the routing decision."""
-        operation = routing.operation
-        expression = routing.expression
-        variable = routing.variable
+        return _QUERY_TEMPLATES[routing.operation].format(variable=routing.variable)
+    
+    def _query_embedding(self, routing: RoutingDecision) -> np.ndarray:
+        """
+        Embed the search query for a routing decision, reusing earlier embeddings.
         
-        query_parts = [
-            f"How to {operation} mathematical expressions",
-            f"{operation} {expression}",
-            f"Rules and methods for {operation}",
-        ]
+        The query text only depends on (operation, variable), so a handful of
+        embeddings cover all traffic and the embedding API call is skipped.
+        """
+        key = (self.embedding_model, routing.operation, routing.variable)
+        with _query_embedding_lock:
+            embedding = _query_embedding_cache.get(key)
+            if embedding is not None:
+                _query_embedding_cache.move_to_end(key)
+                return embedding
         
-        if operation == "differentiate":
-            query_parts.extend([
-                "derivative rules chain rule product rule",
-                f"differentiate with respect to {variable}"
-            ])
-        elif operation == "integrate":
-            query_parts.extend([
-                "integration techniques substitution parts",
-                f"integrate with respect to {variable}"
-            ])
-        elif operation == "simplify":
-            query_parts.extend([
-                "simplification algebraic manipulation",
-                "factoring expanding combining like terms"
-            ])
-        elif operation == "solve":
-            query_parts.extend([
-                "solving equations finding roots",
-                "algebraic solution methods"
-            ])
+        embedding = np.asarray(self.embedding_fn([self._build_query(routing)])[0], dtype=np.float32)
         
-        return " ".join(query_parts)
+        with _query_embedding_lock:
+            _query_embedding_cache[key] = embedding
+            if len(_query_embedding_cache) > _QUERY_EMBEDDING_CACHE_MAX_SIZE:
+                _query_embedding_cache.popitem(last=False)
+        return embedding
     
     @observe(name="rag_retrieval")
     def retrieve(
         self,
         routing: RoutingDecision,
-        n_results: int = 5
+        n_results: int = 5,
+        min_score: Optional[float] = None
     ) -> List[RetrievedChunk]:
         """
         Retrieve relevant knowledge chunks for the given routing decision.
@@ -147,64 +181,73 @@ class MathRAG:
         Args:
             routing: The RoutingDecision from the router
             n_results: Number of chunks to retrieve
+            min_score: Drop chunks whose relevance score is below this
             
         Returns:
-            List of RetrievedChunk objects
+            List of RetrievedChunk objects, each with a pre-formatted citation
         """
         # Use fallback if ChromaDB not available
         if not self.collection:
             return self._fallback_retrieve(routing)
         
-        query = self._build_query(routing)
-        
         try:
             results = self.collection.query(
-                query_texts=[query],
+                query_embeddings=self._query_embedding(routing).reshape(1, -1),
                 n_results=n_results,
                 include=["documents", "metadatas", "distances"]
             )
             
             chunks = []
             if results["ids"] and results["ids"][0]:
-                for i, chunk_id in enumerate(results["ids"][0]):
-                    # Convert distance to similarity score (cosine distance)
-                    distance = results["distances"][0][i] if results["distances"] else 0
-                    similarity = 1 - distance  # Convert distance to similarity
+                ids = results["ids"][0]
+                distances = results["distances"][0] if results["distances"] else [0] * len(ids)
+                documents = results["documents"][0]
+                metadatas = results["metadatas"][0]
+                
+                for chunk_id, distance, document, metadata in zip(ids, distances, documents, metadatas):
+                    # Convert cosine distance to similarity and drop weak
+                    # matches before building any model
+                    similarity = 1 - distance
+                    if min_score is not None and similarity < min_score:
+                        continue
                     
-                    chunks.append(RetrievedChunk(
+                    # Trusted data from our own store, so skip validation
+                    category = metadata.get("category", "general")
+                    chunks.append(RetrievedChunk.model_construct(
                         chunk_id=chunk_id,
-                        content=results["documents"][0][i],
-                        category=results["metadatas"][0][i].get("category", "general"),
+                        content=document,
+                        category=category,
                         relevance_score=similarity,
-                        source=results["metadatas"][0][i].get("source", "")
+                        source=metadata.get("source", ""),
+                        citation=f"[{chunk_id}] {category}"
                     ))
             
             return chunks
             
         except Exception as e:
-            print(f"RAG retrieval error: {e}")
+            log.warning("RAG retrieval error: %s", e)
             return self._fallback_retrieve(routing)
     
+    async def aretrieve(
+        self,
+        routing: RoutingDecision,
+        n_results: int = 5,
+        min_score: Optional[float] = None
+    ) -> List[RetrievedChunk]:
+        """
+        Async variant of retrieve().
+        
+        ChromaDB's PersistentClient is synchronous, so the query runs in a
+        worker thread to keep the event loop free.
+        """
+        return await asyncio.to_thread(self.retrieve, routing, n_results, min_score)
+    
     def _fallback_retrieve(self, routing: RoutingDecision) -> List[RetrievedChunk]:
         """
         Fallback retrieval using built-in knowledge when vector DB unavailable.
         Returns curated explanation knowledge based on operation type.
         """
-        operation = routing.operation
-        
-        # Built-in knowledge organized by operation
-        knowledge = BUILTIN_KNOWLEDGE.get(operation, [])
-        
-        return [
-            RetrievedChunk(
-                chunk_id=f"builtin_{operation}_{i}",
-                content=chunk["content"],
-                category=chunk["category"],
-                relevance_score=0.9,
-                source="built-in knowledge base"
-            )
-            for i, chunk in enumerate(knowledge)
-        ]
+        return list(_FALLBACK_CHUNKS.get(routing.operation, ()))
     
     def initialize_knowledge_base(self):
         """Initialize the knowledge base with curated content."""
@@ -220,7 +263,7 @@ class MathRAG:
                 })
         
         self.add_knowledge(all_chunks)
-        print(f"Initialized knowledge base with {len(all_chunks)} chunks")
+        log.info("Initialized knowledge base with %d chunks", len(all_chunks))
 
 
 # Built-in curated knowledge base
@@ -387,3 +430,19 @@ than solve() in some cases."""
     ]
 }
 
+
+# Fallback chunks are constant, so build them once at import
+_FALLBACK_CHUNKS: Dict[str, Tuple[RetrievedChunk, ...]] = {
+    operation: tuple(
+        RetrievedChunk.model_construct(
+            chunk_id=f"builtin_{operation}_{i}",
+            content=chunk["content"],
+            category=chunk["category"],
+            relevance_score=0.9,
+            source="built-in knowledge base",
+            citation=f"[builtin_{operation}_{i}] {chunk['category']}"
+        )
+        for i, chunk in enumerate(chunks)
+    )
+    for operation, chunks in BUILTIN_KNOWLEDGE.items()
+}
@@ -5,12 +5,25 @@ This lightweight router classifies user requests into exactly one operation:
 differentiate, integrate, simplify, or solve. It also extracts structured
 inputs like the expression and the variable.
 """
-import json
-from typing import Optional
-from openai import OpenAI
-from langfuse import observe
-from langfuse.openai import openai  # LangFuse-wrapped OpenAI for token tracking
+import os
+import re
+import time
+import sqlite3
+import asyncio
+import logging
+import orjson
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, List, Set, Tuple
+import numpy as np
 from .models import RoutingDecision
+from .instrumentation import observe
+from .clients import get_client, get_openai
+
+log = logging.getLogger("mathai")
+
+if TYPE_CHECKING:
+    from openai import OpenAI, AsyncOpenAI
 
 
 ROUTER_SYSTEM_PROMPT = """You are a mathematical query router. Your job is to:
@@ -45,6 +58,338 @@ Response: {"operation": "integrate", "expression": "e^x * cos(x)", "variable": "
 
 """
 
+ROUTER_BATCH_PROMPT = ROUTER_SYSTEM_PROMPT + """
+Batch mode: the user message is a JSON array of independent queries.
+Route each query on its own and respond with a JSON object of the form
+{"results": [<routing object>, ...]} containing exactly one routing object
+per query, in the same order as the input array.
+"""
+
+# Structured-output schema for one routing object. Strict mode makes the
+# server enforce it, so replies stop right after the closing brace.
+ROUTING_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "operation": {"type": "string", "enum": ["differentiate", "integrate", "simplify", "solve"]},
+        "expression": {"type": "string"},
+        "variable": {"type": "string"},
+        "solve_for": {"type": ["string", "null"]},
+        "assumptions": {"type": "array", "items": {"type": "string"}},
+        "confidence": {"type": "number"}
+    },
+    "required": ["operation", "expression", "variable", "solve_for", "assumptions", "confidence"],
+    "additionalProperties": False
+}
+
+ROUTING_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "routing_decision", "strict": True, "schema": ROUTING_SCHEMA}
+}
+
+ROUTING_BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "routing_decisions",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"results": {"type": "array", "items": ROUTING_SCHEMA}},
+            "required": ["results"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# A routing object is ~40-60 tokens; the cap only guards runaway output
+ROUTER_MAX_TOKENS = 128
+
+# In-memory LRU of routing decisions keyed by (model, normalized query).
+# Entries expire after a day so prompt or model changes eventually apply.
+_route_cache: "OrderedDict[Tuple[str, str], Tuple[float, RoutingDecision]]" = OrderedDict()
+_route_cache_lock = threading.Lock()
+_ROUTE_CACHE_MAX_SIZE = 4096
+_ROUTE_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups (case, LaTeX $ delimiters, whitespace)."""
+    return " ".join(query.replace("$", "").lower().split())
+
+
+# Explicit routing DSL for programmatic callers: "!diff x^2", "!int sin(x) dx",
+# "!solve x^2 - y = 0 wrt y". Operation names map to canonical operations.
+DSL_OPERATIONS = {
+    "diff": "differentiate", "differentiate": "differentiate",
+    "int": "integrate", "integrate": "integrate",
+    "simp": "simplify", "simplify": "simplify",
+    "solve": "solve",
+}
+_DSL_RE = re.compile(
+    r"^!(?P<op>[a-z]+)\s+(?P<expr>.+?)(?:\s+d(?P<dvar>[a-z]))?(?:\s+wrt\s+(?P<var>\w+))?$",
+    re.IGNORECASE
+)
+
+
+def parse_dsl_query(query: str) -> Optional[RoutingDecision]:
+    """
+    Route a "!op expression [wrt var]" query without the LLM.
+    
+    Returns:
+        RoutingDecision, or None if the query is not valid DSL
+    """
+    match = _DSL_RE.match(query.strip())
+    if match is None:
+        return None
+    operation = DSL_OPERATIONS.get(match.group("op").lower())
+    if operation is None:
+        return None
+    
+    variable = match.group("var") or match.group("dvar") or "x"
+    return RoutingDecision(
+        operation=operation,
+        expression=match.group("expr"),
+        variable=variable,
+        solve_for=variable if operation == "solve" else None,
+        confidence=1.0
+    )
+
+
+# Unambiguous opening phrases routed locally without an LLM call, mapped to
+# their operation. The phrase must open the query and everything after it
+# must be plain math.
+OP_MAP = {
+    "differentiate": "differentiate",
+    "derivative of": "differentiate",
+    "the derivative of": "differentiate",
+    "find the derivative of": "differentiate",
+    **{f"d/d{letter}": "differentiate" for letter in "abcdefghijklmnopqrstuvwxyz"},
+    "integrate": "integrate",
+    "integral of": "integrate",
+    "the integral of": "integrate",
+    "find the integral of": "integrate",
+    "antiderivative of": "integrate",
+    "the antiderivative of": "integrate",
+    "find the antiderivative of": "integrate",
+    "simplify": "simplify",
+    "solve": "solve",
+}
+# One pass splits a query into opening phrase, expression and an optional
+# trailing differential ("dx"), "with respect to x" or "for x"
+_KEYWORD_RE = re.compile(
+    r"^(?P<phrase>" + "|".join(map(re.escape, sorted(OP_MAP, key=len, reverse=True))) + r")\s+"
+    r"(?P<expr>.+?)(?:\s*(?<![a-z])d(?P<dvar>[a-z]))?"
+    r"(?:\s+(?P<clause>with respect to|for)\s+(?P<var>[a-z]))?$"
+)
+# Trailing clauses each operation accepts
+_OP_CLAUSES = {
+    "differentiate": {None, "with respect to"},
+    "integrate": {None, "with respect to"},
+    "simplify": {None},
+    "solve": {None, "for"},
+}
+_PLAIN_MATH_RE = re.compile(r"^[\w\s^*+\-/().=,]+$")
+_NAME_RE = re.compile(r"[a-z]+")
+_KNOWN_NAMES = frozenset({
+    "sin", "cos", "tan", "cot", "sec", "csc", "sinh", "cosh", "tanh",
+    "asin", "acos", "atan", "arcsin", "arccos", "arctan",
+    "log", "ln", "exp", "sqrt", "abs", "pi", "e"
+})
+
+
+def classify_query(query: str) -> Optional[RoutingDecision]:
+    """
+    Route an unambiguous query ("differentiate x^2", "solve x^2 = 4 for x")
+    without the LLM.
+    
+    Returns:
+        RoutingDecision, or None when the query needs the LLM router (other
+        phrasings, English words in the expression, unclear variable)
+    """
+    match = _KEYWORD_RE.match(normalize_query(query).rstrip("?."))
+    if match is None:
+        return None
+    phrase, dvar, clause = match.group("phrase", "dvar", "clause")
+    operation = OP_MAP[phrase]
+    if clause not in _OP_CLAUSES[operation] or (dvar and operation != "integrate"):
+        return None
+    if phrase.startswith("d/d"):
+        dvar = phrase[-1]
+    
+    expression = match.group("expr").strip()
+    if not _PLAIN_MATH_RE.match(expression):
+        return None
+    
+    names = _NAME_RE.findall(expression)
+    if any(len(name) > 1 and name not in _KNOWN_NAMES for name in names):
+        return None
+    
+    variable = match.group("var") or dvar
+    if variable is None:
+        letters = {name for name in names if len(name) == 1 and name != "e"}
+        if len(letters) > 1 and operation != "simplify":
+            return None
+        variable = letters.pop() if len(letters) == 1 else "x"
+    
+    return RoutingDecision(
+        operation=operation,
+        expression=expression,
+        variable=variable,
+        solve_for=variable if operation == "solve" else None,
+        confidence=0.95
+    )
+
+
+# Tokens that change the math: numbers, operators, function names and
+# single-letter symbols. A paraphrase only hits the semantic cache when
+# these match, so "x^2" and "x^3" never share a decision.
+_MATH_TOKEN_RE = re.compile(
+    r"\d+(?:\.\d+)?|[-+*/^=()]|\b(?:sin|cos|tan|cot|sec|csc|log|ln|exp|sqrt|[a-z])\b"
+)
+
+
+# Operation words (stems) mapped to the operation they ask for, so "derivative
+# of x^2" and "integral of x^2" get different signatures despite near-identical
+# embeddings. Longer stems come first in the pattern ("antideriv" before "deriv").
+_OPERATION_WORDS = {
+    "antideriv": "integrate", "integra": "integrate", "area": "integrate",
+    "deriv": "differentiate", "differentiat": "differentiate", "d/d": "differentiate",
+    "slope": "differentiate", "rate of change": "differentiate",
+    "simplif": "simplify", "reduce": "simplify", "expand": "simplify",
+    "factor": "simplify", "combine": "simplify",
+    "solve": "solve", "root": "solve", "zero": "solve",
+}
+_OPERATION_WORD_RE = re.compile("|".join(
+    re.escape(word) for word in sorted(_OPERATION_WORDS, key=len, reverse=True)
+))
+
+
+def math_signature(query: str) -> Tuple[str, ...]:
+    """
+    Extract the operations a query names (sorted) followed by its
+    math-bearing tokens, in order.
+    """
+    normalized = normalize_query(query)
+    operations = {_OPERATION_WORDS[word] for word in _OPERATION_WORD_RE.findall(normalized)}
+    return tuple(sorted(operations)) + tuple(_MATH_TOKEN_RE.findall(normalized))
+
+
+class SemanticRouteCache:
+    """
+    Nearest-neighbour cache of routing decisions over query embeddings.
+    
+    Catches paraphrases ("what is the derivative of x^2" vs "differentiate
+    x^2") that miss the exact-match cache. Embeddings are unit vectors in a
+    preallocated float32 matrix, so a lookup is one matrix-vector product.
+    The oldest entry is overwritten once the cache is full.
+    """
+    
+    def __init__(self, threshold: float = 0.92, max_size: int = 4096):
+        self.threshold = threshold
+        self.max_size = max_size
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Tuple[Tuple[str, ...], RoutingDecision]] = []
+        self._next_slot = 0
+        self._lock = threading.Lock()
+    
+    def lookup(self, embedding: np.ndarray, signature: Tuple[str, ...]) -> Optional[RoutingDecision]:
+        """
+        Find the most similar cached query with the same math signature.
+        
+        Returns:
+            A copy of its RoutingDecision, or None if none clears the threshold
+        """
+        with self._lock:
+            if not self._entries:
+                return None
+            similarities = self._vectors[:len(self._entries)] @ embedding
+            candidates = np.flatnonzero(similarities >= self.threshold)
+            for index in candidates[np.argsort(similarities[candidates])[::-1]]:
+                cached_signature, decision = self._entries[index]
+                if cached_signature == signature:
+                    return decision.model_copy(deep=True)
+        return None
+    
+    def add(self, embedding: np.ndarray, signature: Tuple[str, ...], decision: RoutingDecision):
+        """Store a decision under its query embedding."""
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.empty((self.max_size, embedding.size), dtype=np.float32)
+            slot = self._next_slot
+            self._vectors[slot] = embedding
+            if slot < len(self._entries):
+                self._entries[slot] = (signature, decision)
+            else:
+                self._entries.append((signature, decision))
+            self._next_slot = (slot + 1) % self.max_size
+
+
+class PersistentRouteCache:
+    """
+    SQLite-backed store of routing decisions that survives process restarts.
+    
+    Sits behind the in-memory LRU, so a new process (CLI run, serverless cold
+    start) still hits on queries anyone asked before. Entries expire after
+    `ttl_seconds` of wall-clock time. Database errors and undecodable rows
+    are treated as misses. Opening the database raises OSError/sqlite3.Error;
+    MathRouter then runs without the persistent cache.
+    """
+    
+    def __init__(self, path: str, ttl_seconds: int = 30 * 24 * 60 * 60):
+        self.path = os.path.expanduser(path)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS route_cache ("
+                "model TEXT, query TEXT, decision TEXT, stored_at REAL, "
+                "PRIMARY KEY (model, query))"
+            )
+    
+    def get(self, model: str, query: str) -> Optional[RoutingDecision]:
+        """Fetch an unexpired decision for a normalized query, or None."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT decision FROM route_cache "
+                    "WHERE model = ? AND query = ? AND stored_at > ?",
+                    (model, query, time.time() - self.ttl_seconds)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        try:
+            return RoutingDecision.model_validate_json(row[0])
+        except ValueError:
+            return None  # Corrupt or outdated row
+    
+    def set(self, model: str, query: str, decision: RoutingDecision):
+        """Store a decision for a normalized query."""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO route_cache VALUES (?, ?, ?, ?)",
+                    (model, query, decision.model_dump_json(), time.time())
+                )
+        except sqlite3.Error:
+            pass  # Cache errors should not break routing
+    
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+
+def _unit_vector(embedding: List[float]) -> np.ndarray:
+    """Convert an API embedding into a unit-length float32 vector."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
 
 class MathRouter:
     """
@@ -54,12 +399,164 @@ class MathRouter:
     
     def __init__(
         self,
-        client: Optional[OpenAI] = None,
-        model: str = "gpt-4o-mini"
+        client: Optional["OpenAI"] = None,
+        model: str = "gpt-4o-mini",
+        async_client: Optional["AsyncOpenAI"] = None,
+        semantic_threshold: Optional[float] = None,
+        embedding_model: str = "text-embedding-3-small",
+        cache_path: Optional[str] = None
     ):
         # Use LangFuse-wrapped client for automatic token tracking
-        self.client = openai.OpenAI()
+        self.client = client or get_client()
+        self.async_client = async_client or get_openai().AsyncOpenAI()
         self.model = model
+        
+        # Optional paraphrase cache; costs one embedding call per cache miss
+        self.embedding_model = embedding_model
+        self.semantic_cache = (
+            SemanticRouteCache(semantic_threshold) if semantic_threshold else None
+        )
+        
+        # Optional on-disk cache so decisions outlive the process
+        self.persistent_cache = None
+        if cache_path:
+            try:
+                self.persistent_cache = PersistentRouteCache(cache_path)
+            except (OSError, sqlite3.Error) as e:
+                log.warning("Router cache disabled, cannot open %s: %s", cache_path, e)
+    
+    async def awarm_up(self, timeout: float = 5.0):
+        """
+        Open the async client's connection before the first query.
+        
+        Issues a tiny models.list() call so TLS setup and auth happen at
+        startup. Served traffic (RouterBatcher -> aroute) and the pipeline's
+        explainer share this client's connection pool. Failures are ignored.
+        
+        Args:
+            timeout: Seconds to allow for the warmup request
+        """
+        try:
+            await self.async_client.models.list(timeout=timeout)
+        except Exception:
+            pass  # Warmup is best effort
+    
+    def _build_request(self, query: str) -> dict:
+        """Build the chat completion arguments for a routing call."""
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": ROUTER_SYSTEM_PROMPT},
+                {"role": "user", "content": query}
+            ],
+            "temperature": 0,
+            "max_tokens": ROUTER_MAX_TOKENS,
+            "response_format": ROUTING_RESPONSE_FORMAT
+        }
+    
+    def _decision_from_dict(self, parsed: dict, query: str) -> RoutingDecision:
+        """Validate a parsed routing object into a RoutingDecision."""
+        return RoutingDecision(
+            operation=parsed.get("operation", "simplify"),
+            expression=parsed.get("expression", query),
+            variable=parsed.get("variable", "x"),
+            solve_for=parsed.get("solve_for"),
+            assumptions=parsed.get("assumptions", []),
+            confidence=parsed.get("confidence", 0.8)
+        )
+    
+    def _parse_response(self, content: str, query: str) -> RoutingDecision:
+        """Parse the router's JSON reply into a RoutingDecision."""
+        try:
+            parsed = orjson.loads(content)
+            
+            # Validate and create RoutingDecision
+            return self._decision_from_dict(parsed, query)
+            
+        except orjson.JSONDecodeError as e:
+            # Fallback: try to parse as simplify operation
+            return RoutingDecision(
+                operation="simplify",
+                expression=query,
+                variable="x",
+                confidence=0.3,
+                assumptions=[f"Parse error, defaulting to simplify: {str(e)}"]
+            )
+    
+    def _fast_decision(self, query: str) -> Optional[RoutingDecision]:
+        """Route from the DSL, the memo cache or the keyword classifier, without the LLM."""
+        return parse_dsl_query(query) or self._cached_decision(query) or classify_query(query)
+    
+    def _cached_decision(self, query: str) -> Optional[RoutingDecision]:
+        """Return a memoized routing decision for this query, if any."""
+        key = (self.model, normalize_query(query))
+        with _route_cache_lock:
+            cached = _route_cache.get(key)
+            if cached is not None:
+                stored_at, decision = cached
+                if time.monotonic() - stored_at < _ROUTE_CACHE_TTL_SECONDS:
+                    _route_cache.move_to_end(key)
+                    # Copy so callers can't mutate the cached entry
+                    return decision.model_copy(deep=True)
+                del _route_cache[key]
+        
+        if self.persistent_cache is None:
+            return None
+        decision = self.persistent_cache.get(*key)
+        if decision is not None:
+            self._remember(key, decision)
+        return decision
+    
+    def _store_decision(self, query: str, decision: RoutingDecision):
+        """Memoize a routing decision (low-confidence fallbacks are skipped)."""
+        if decision.confidence < 0.5:
+            return
+        key = (self.model, normalize_query(query))
+        self._remember(key, decision)
+        if self.persistent_cache is not None:
+            self.persistent_cache.set(*key, decision)
+    
+    def _remember(self, key: Tuple[str, str], decision: RoutingDecision):
+        """Put a decision in the in-memory LRU."""
+        with _route_cache_lock:
+            _route_cache[key] = (time.monotonic(), decision)
+            _route_cache.move_to_end(key)
+            if len(_route_cache) > _ROUTE_CACHE_MAX_SIZE:
+                _route_cache.popitem(last=False)
+    
+    def _embed(self, query: str) -> Optional[np.ndarray]:
+        """Embed a query for the semantic cache, or None if the call fails."""
+        try:
+            response = self.client.embeddings.create(model=self.embedding_model, input=query)
+            return _unit_vector(response.data[0].embedding)
+        except Exception:
+            return None
+    
+    async def _aembed(self, query: str) -> Optional[np.ndarray]:
+        """Async variant of _embed()."""
+        try:
+            response = await self.async_client.embeddings.create(model=self.embedding_model, input=query)
+            return _unit_vector(response.data[0].embedding)
+        except Exception:
+            return None
+    
+    def _semantic_decision(
+        self,
+        query: str,
+        embedding: Optional[np.ndarray]
+    ) -> Optional[RoutingDecision]:
+        """Return the decision of a cached paraphrase, promoting it to the exact cache."""
+        if embedding is None:
+            return None
+        decision = self.semantic_cache.lookup(embedding, math_signature(query))
+        if decision:
+            self._store_decision(query, decision)
+        return decision
+    
+    def _store_semantic(self, query: str, embedding: Optional[np.ndarray], decision: RoutingDecision):
+        """Add a fresh LLM decision to the semantic cache (same rule as the exact cache)."""
+        if embedding is not None and decision.confidence >= 0.5:
+            self.semantic_cache.add(embedding, math_signature(query), decision)
     
     @observe(name="math_router")
     def route(self, query: str) -> RoutingDecision:
@@ -72,40 +569,319 @@ class MathRouter:
         Returns:
             RoutingDecision with operation, expression, variable, etc.
         """
+        cached = self._fast_decision(query)
+        if cached:
+            return cached
+        
+        embedding = None
+        if self.semantic_cache:
+            embedding = self._embed(query)
+            cached = self._semantic_decision(query, embedding)
+            if cached:
+                return cached
+        
         try:
-            response = self.client.chat.completions.create(
+            response = self.client.chat.completions.create(**self._build_request(query))
+            decision = self._parse_response(response.choices[0].message.content, query)
+        except Exception as e:
+            raise RuntimeError(f"Router failed: {str(e)}")
+        
+        self._store_decision(query, decision)
+        if self.semantic_cache:
+            self._store_semantic(query, embedding, decision)
+        return decision
+    
+    @observe(name="math_router")
+    async def aroute(self, query: str) -> RoutingDecision:
+        """
+        Async variant of route() that does not block the event loop.
+        
+        Args:
+            query: The user's natural language math query
+            
+        Returns:
+            RoutingDecision with operation, expression, variable, etc.
+        """
+        cached = self._fast_decision(query)
+        if cached:
+            return cached
+        
+        embedding = None
+        if self.semantic_cache:
+            embedding = await self._aembed(query)
+            cached = self._semantic_decision(query, embedding)
+            if cached:
+                return cached
+        
+        try:
+            response = await self.async_client.chat.completions.create(**self._build_request(query))
+            decision = self._parse_response(response.choices[0].message.content, query)
+        except Exception as e:
+            raise RuntimeError(f"Router failed: {str(e)}")
+        
+        self._store_decision(query, decision)
+        if self.semantic_cache:
+            self._store_semantic(query, embedding, decision)
+        return decision
+    
+    @observe(name="math_router_batch")
+    async def aroute_batch(self, queries: List[str]) -> List[RoutingDecision]:
+        """
+        Route several queries with a single chat completion.
+        
+        Args:
+            queries: User queries to classify
+            
+        Returns:
+            One RoutingDecision per query, in input order
+            
+        Raises:
+            RuntimeError: If the call fails or the reply cannot be demuxed
+        """
+        try:
+            response = await self.async_client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": ROUTER_SYSTEM_PROMPT},
-                    {"role": "user", "content": query}
+                    {"role": "system", "content": ROUTER_BATCH_PROMPT},
+                    {"role": "user", "content": orjson.dumps(queries).decode()}
                 ],
                 temperature=0,
-                max_tokens=256,
-                response_format={"type": "json_object"}
+                max_tokens=ROUTER_MAX_TOKENS * len(queries),
+                response_format=ROUTING_BATCH_RESPONSE_FORMAT
             )
             
-            content = response.choices[0].message.content
-            parsed = json.loads(content)
+            results = orjson.loads(response.choices[0].message.content).get("results", [])
+            if len(results) != len(queries):
+                raise ValueError(
+                    f"expected {len(queries)} routing results, got {len(results)}"
+                )
             
-            # Validate and create RoutingDecision
-            return RoutingDecision(
-                operation=parsed.get("operation", "simplify"),
-                expression=parsed.get("expression", query),
-                variable=parsed.get("variable", "x"),
-                solve_for=parsed.get("solve_for"),
-                assumptions=parsed.get("assumptions", []),
-                confidence=parsed.get("confidence", 0.8)
-            )
-            
-        except json.JSONDecodeError as e:
-            # Fallback: try to parse as simplify operation
-            return RoutingDecision(
-                operation="simplify",
-                expression=query,
-                variable="x",
-                confidence=0.3,
-                assumptions=[f"Parse error, defaulting to simplify: {str(e)}"]
-            )
+            decisions = [
+                self._decision_from_dict(parsed, query)
+                for parsed, query in zip(results, queries)
+            ]
         except Exception as e:
-            raise RuntimeError(f"Router failed: {str(e)}")
+            raise RuntimeError(f"Batch router failed: {str(e)}")
+        
+        for query, decision in zip(queries, decisions):
+            self._store_decision(query, decision)
+        return decisions
+    
+    async def route_many(
+        self,
+        queries: List[str],
+        max_concurrency: int = 50
+    ) -> List[RoutingDecision]:
+        """
+        Route many queries concurrently (eval runs, test suites).
+        
+        Each query is a separate aroute() call, so caching applies per query
+        and one bad reply does not fail the rest. At most max_concurrency
+        calls are in flight at once.
+        
+        Args:
+            queries: User queries to classify
+            max_concurrency: Cap on simultaneous LLM requests
+            
+        Returns:
+            One RoutingDecision per query, in input order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def route_one(query: str) -> RoutingDecision:
+            async with semaphore:
+                return await self.aroute(query)
+        
+        return await asyncio.gather(*(route_one(query) for query in queries))
+    
+    def submit_batch(self, queries: List[str]) -> str:
+        """
+        Submit queries as an offline OpenAI Batch API job (24h window, lower cost).
+        
+        Args:
+            queries: User queries to classify
+            
+        Returns:
+            The batch id; pass the finished output file to parse_batch_output()
+        """
+        lines = [
+            orjson.dumps({
+                "custom_id": str(index),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._build_request(query)
+            })
+            for index, query in enumerate(queries)
+        ]
+        batch_file = self.client.files.create(
+            file=("router_batch.jsonl", b"\n".join(lines)),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+    
+    def parse_batch_output(self, output_jsonl: str, queries: List[str]) -> List[Optional[RoutingDecision]]:
+        """
+        Turn a finished batch's output file into routing decisions.
+        
+        Args:
+            output_jsonl: Contents of the batch output file
+            queries: The queries passed to submit_batch(), in the same order
+            
+        Returns:
+            One RoutingDecision per query in input order, None where the
+            request failed
+        """
+        decisions: List[Optional[RoutingDecision]] = [None] * len(queries)
+        for line in output_jsonl.splitlines():
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+            index = int(record["custom_id"])
+            content = response["body"]["choices"][0]["message"]["content"]
+            decisions[index] = self._parse_response(content, queries[index])
+            self._store_decision(queries[index], decisions[index])
+        return decisions
+
+
+def _cancel_callers(batch: List[Tuple[str, asyncio.Future]]):
+    """Cancel the futures of callers whose batch will never be routed."""
+    for _, future in batch:
+        future.cancel()
+
 
+class RouterBatcher:
+    """
+    Coalesces concurrent routing requests into a single LLM call.
+    
+    Queries that arrive within a short window are sent to the router as one
+    batched chat completion and the results are handed back to each waiting
+    caller. The added latency is bounded by the window.
+    """
+    
+    def __init__(
+        self,
+        router: MathRouter,
+        max_batch_size: int = 16,
+        window_ms: float = 10.0
+    ):
+        self.router = router
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # The event loop only holds weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def route(self, query: str) -> RoutingDecision:
+        """
+        Route a query, sharing the LLM call with any concurrent queries.
+        
+        Args:
+            query: The user's natural language math query
+            
+        Returns:
+            RoutingDecision with operation, expression, variable, etc.
+        """
+        # Memoized and keyword-classified queries skip the batching window
+        cached = self.router._fast_decision(query)
+        if cached:
+            return cached
+        
+        loop = asyncio.get_running_loop()
+        self._ensure_worker(loop)
+        
+        future = loop.create_future()
+        await self._queue.put((query, future))
+        return await future
+    
+    def _ensure_worker(self, loop: asyncio.AbstractEventLoop):
+        """Start the collector task on the current event loop if needed."""
+        # process() and aprocess() route on different loops, so the queue
+        # and worker are rebuilt whenever the loop changes.
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._collect())
+    
+    async def aclose(self):
+        """
+        Stop the collector and cancel in-flight flushes (app shutdown).
+        
+        Callers still waiting on a query are cancelled rather than left
+        hanging. Must be awaited on the loop the batcher routes on.
+        """
+        if self._loop is not asyncio.get_running_loop():
+            return
+        tasks = [task for task in (self._worker, *self._tasks) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+        self._worker = None
+    
+    async def _collect(self):
+        """Gather queued queries into batches and dispatch them."""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            
+            try:
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                _cancel_callers(batch)
+                raise
+            
+            # Dispatch without blocking collection of the next batch
+            task = loop.create_task(self._flush(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _flush(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Route a batch and resolve each caller's future."""
+        queries = [query for query, _ in batch]
+        
+        try:
+            if len(queries) == 1:
+                results = await asyncio.gather(self.router.aroute(queries[0]), return_exceptions=True)
+            else:
+                try:
+                    results = await self.router.aroute_batch(queries)
+                except Exception:
+                    # Fall back to one call per query so a bad batch reply
+                    # doesn't fail every caller
+                    results = await asyncio.gather(
+                        *(self.router.aroute(query) for query in queries),
+                        return_exceptions=True
+                    )
+        except asyncio.CancelledError:
+            _cancel_callers(batch)
+            raise
+        
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,61 @@
+"""
+Tests for the shared Redis response cache (Redis is mocked).
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+from core.cache import RedisResponseCache, REDIS_AVAILABLE
+from core.models import MathResponse
+
+pytestmark = pytest.mark.skipif(not REDIS_AVAILABLE, reason="redis package not installed")
+
+
+def _cache(messages, lock_held=True):
+    """Build a cache whose pubsub channel delivers `messages`."""
+    cache = RedisResponseCache("redis://localhost:6379/0", lock_ttl_seconds=30)
+
+    async def listen():
+        for message in messages:
+            yield message
+        await asyncio.sleep(3600)  # Nothing else is ever published
+
+    pubsub = Mock(subscribe=AsyncMock(), aclose=AsyncMock(), listen=listen)
+    cache.redis = Mock(
+        get=AsyncMock(return_value=None),
+        exists=AsyncMock(return_value=int(lock_held)),
+        delete=AsyncMock(),
+        publish=AsyncMock(),
+        pubsub=Mock(return_value=pubsub)
+    )
+    return cache
+
+
+class TestWaitFor:
+    """Test waiting on another worker's result."""
+
+    def test_returns_published_response(self):
+        response = MathResponse(success=True, query="q", operation="differentiate", answer="2*x")
+        cache = _cache([{"type": "message", "data": response.model_dump_json()}])
+
+        assert asyncio.run(cache.wait_for("k")) == response
+
+    def test_release_without_result_wakes_waiters(self):
+        cache = _cache([{"type": "subscribe"}, {"type": "message", "data": RedisResponseCache.DONE_SENTINEL}])
+
+        result = asyncio.run(asyncio.wait_for(cache.wait_for("k"), timeout=1))
+
+        assert result is None
+
+    def test_lock_released_before_subscribe(self):
+        cache = _cache([], lock_held=False)
+
+        assert asyncio.run(asyncio.wait_for(cache.wait_for("k"), timeout=1)) is None
+
+    def test_release_publishes_sentinel(self):
+        cache = _cache([])
+
+        asyncio.run(cache.release("k"))
+
+        cache.redis.publish.assert_awaited_once_with(
+            RedisResponseCache.CHANNEL_PREFIX + "k", RedisResponseCache.DONE_SENTINEL
+        )
@@ -2,11 +2,13 @@
 Tests for the SymPy computation engine.
 """
 import pytest
-from core.compute import SymPyEngine
+from unittest.mock import patch
+from core import compute as compute_module
+from core.compute import SymPyEngine, normalize_expression
 from core.models import RoutingDecision
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def engine():
     return SymPyEngine()
 
@@ -45,6 +47,16 @@ class TestDifferentiation:
         assert result.success
         assert "exp" in result.result
     
+    def test_c_is_a_symbol(self, engine):
+        routing = RoutingDecision(
+            operation="differentiate",
+            expression="c*x",
+            variable="x"
+        )
+        result = engine.compute(routing)
+        assert result.success
+        assert result.result == "c"
+    
     def test_natural_log(self, engine):
         routing = RoutingDecision(
             operation="differentiate",
@@ -89,6 +101,16 @@ class TestIntegration:
         result = engine.compute(routing)
         assert result.success
         assert "sin" in result.result
+    
+    def test_no_closed_form(self, engine):
+        routing = RoutingDecision(
+            operation="integrate",
+            expression="sin(sin(x))",
+            variable="x"
+        )
+        result = engine.compute(routing)
+        assert not result.success
+        assert result.error_type == "computation_error"
 
 
 class TestSimplification:
@@ -113,6 +135,17 @@ class TestSimplification:
         result = engine.compute(routing)
         assert result.success
         assert result.result == "1"
+    
+    def test_already_simple(self, engine):
+        routing = RoutingDecision(
+            operation="simplify",
+            expression="x + 1",
+            variable="x"
+        )
+        result = engine.compute(routing)
+        assert result.success
+        assert result.result == "x + 1"
+        assert result.intermediate_steps == ["Already simple: x + 1"]
 
 
 class TestSolve:
@@ -140,6 +173,17 @@ class TestSolve:
         assert result.success
         assert "2" in result.result
         assert "-2" in result.result
+    
+    def test_equation_with_both_sides(self, engine):
+        routing = RoutingDecision(
+            operation="solve",
+            expression="x^2 + 2x = 3x + 6",
+            variable="x",
+            solve_for="x"
+        )
+        result = engine.compute(routing)
+        assert result.success
+        assert result.result == "x = -2 or 3"
 
 
 class TestErrorHandling:
@@ -156,3 +200,83 @@ class TestErrorHandling:
         assert result.error is not None
         assert result.error_type == "parse_error"
 
+
+
+class TestParseCache:
+    """Test caching of parsed expressions."""
+    
+    def test_normalize_expression(self):
+        assert normalize_expression("  x^2 +  1 ") == "x^2+1"
+        assert normalize_expression("sin  x") == "sin x"
+    
+    def test_preprocess(self, engine):
+        assert engine._preprocess("x^2 - 4 = 0") == "x^2 - 4"
+        assert engine._preprocess("2×x \\cdot y dx") == "2*x * y"
+    
+    def test_equivalent_inputs_share_parse(self, engine):
+        first, _ = engine._parse_expression("x^2 + 1")
+        second, _ = engine._parse_expression("x^2+1")
+        assert first is second
+
+
+class TestComputeCache:
+    """Test caching of computation results."""
+    
+    def test_repeat_computation_uses_cache(self, engine):
+        compute_module._COMPUTE_CACHE.clear()
+        routing = RoutingDecision(operation="integrate", expression="x*exp(x)", variable="x")
+        
+        first = engine.compute(routing)
+        with patch.object(compute_module, "integrate", side_effect=AssertionError("not cached")):
+            second = engine.compute(routing)
+        
+        assert first == second
+        assert first.intermediate_steps is not second.intermediate_steps
+    
+    def test_steps_are_optional(self, engine):
+        compute_module._COMPUTE_CACHE.clear()
+        routing = RoutingDecision(operation="simplify", expression="(x^2 - 1)/(x - 1)")
+        
+        bare = engine.compute(routing, steps=False)
+        full = engine.compute(routing)
+        
+        assert bare.result == full.result == "x + 1"
+        assert bare.intermediate_steps == []
+        assert full.intermediate_steps
+    
+    def test_already_simple_respects_steps(self, engine):
+        compute_module._COMPUTE_CACHE.clear()
+        routing = RoutingDecision(operation="simplify", expression="sin(x)")
+        
+        assert engine.compute(routing, steps=False).intermediate_steps == []
+
+
+class TestNumericEvaluator:
+    """Test compiled numeric evaluation."""
+    
+    def test_evaluates_scalars_and_arrays(self, engine):
+        np = pytest.importorskip("numpy")
+        f = engine.numeric_evaluator("sin(x)^2 + x*y", variables=("x", "y"))
+        
+        assert f(0.0, 2.0) == pytest.approx(0.0)
+        assert np.allclose(f(np.array([1.0, 2.0]), 3.0), np.sin([1.0, 2.0]) ** 2 + [3.0, 6.0])
+    
+    def test_invalid_expression_returns_none(self, engine):
+        assert engine.numeric_evaluator("not a valid expression @#$") is None
+    
+    def test_evaluate_many(self, engine):
+        np = pytest.importorskip("numpy")
+        xs = np.linspace(0.0, 1.0, 5)
+        
+        values = engine.evaluate_many(["x^2", "sin(x)", "3", "not valid @#$"], xs)
+        
+        assert values.shape == (4, 5)
+        assert np.allclose(values[:3], [xs ** 2, np.sin(xs), np.full(5, 3.0)])
+        assert np.isnan(values[3]).all()
+    
+    def test_evaluate_batch(self, engine):
+        np = pytest.importorskip("numpy")
+        xs = np.linspace(-1.0, 1.0, 1000)
+        
+        assert np.allclose(engine.evaluate_batch("3*t^2", xs, variable="t"), 3 * xs ** 2)
+        assert np.allclose(engine.evaluate_batch("5", xs), 5.0)
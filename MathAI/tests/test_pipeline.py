@@ -2,10 +2,15 @@
 Integration tests for the full MathAI v2 pipeline.
 """
 import os
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, AsyncMock, patch
+from core import pipeline as pipeline_module
 from core.pipeline import MathPipeline
-from core.models import RoutingDecision, ComputeResult
+from core.models import RoutingDecision, ComputeResult, MathResponse
 
 
 # Skip integration tests if no API key is set
@@ -30,14 +35,255 @@ class TestPipelineIntegration:
         assert result.explanation is not None
 
 
+@pytest.fixture
+def mocked_pipeline(monkeypatch):
+    """Pipeline with router, RAG and explainer mocked out (SymPy is real)."""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(pipeline_module, "MathRAG", Mock())
+    pipeline_module._response_cache.clear()
+    pipeline_module._compute_cache.clear()
+    pipeline_module._failure_cache.clear()
+    
+    pipeline = MathPipeline(langfuse_enabled=False)
+    pipeline.router_batcher.route = AsyncMock(return_value=RoutingDecision(
+        operation="differentiate",
+        expression="x^2",
+        variable="x"
+    ))
+    pipeline.rag.aretrieve = AsyncMock(return_value=[])
+    pipeline.explainer.aexplain = AsyncMock(return_value="Apply the power rule.")
+    
+    yield pipeline
+    pipeline_module._response_cache.clear()
+    pipeline_module._compute_cache.clear()
+    pipeline_module._failure_cache.clear()
+
+
+class TestPipelineCaching:
+    """Tests for response caching and single-flight deduplication."""
+    
+    def test_repeat_query_is_served_from_cache(self, mocked_pipeline):
+        first = mocked_pipeline.process("differentiate x^2")
+        second = mocked_pipeline.process("differentiate x^2")
+        
+        assert first.answer == second.answer == "2*x"
+        assert mocked_pipeline.router_batcher.route.await_count == 1
+    
+    def test_paraphrase_reuses_compute_result(self, mocked_pipeline, monkeypatch):
+        compute = Mock(wraps=mocked_pipeline.compute_engine.compute)
+        monkeypatch.setattr(mocked_pipeline.compute_engine, "compute", compute)
+        
+        mocked_pipeline.process("differentiate x^2")
+        mocked_pipeline.process("what is the derivative of x squared")
+        
+        assert mocked_pipeline.router_batcher.route.await_count == 2
+        assert compute.call_count == 1
+    
+    def test_repeated_failure_is_served_from_failure_cache(self, mocked_pipeline, monkeypatch):
+        mocked_pipeline.router_batcher.route.return_value = RoutingDecision(
+            operation="simplify",
+            expression="not a valid expression @#$"
+        )
+        
+        first = mocked_pipeline.process("simplify garbage")
+        second = mocked_pipeline.process("simplify garbage")
+        
+        assert not first.success and first.error_type == "parse_error"
+        assert second.error == first.error
+        assert mocked_pipeline.router_batcher.route.await_count == 1
+        
+        # Expired failures are recomputed
+        monkeypatch.setattr(pipeline_module, "_FAILURE_CACHE_TTL_SECONDS", 0)
+        mocked_pipeline.process("simplify garbage")
+        assert mocked_pipeline.router_batcher.route.await_count == 2
+    
+    def test_equivalent_spellings_share_a_key(self, mocked_pipeline):
+        key = mocked_pipeline._get_cache_key
+        
+        assert key("Differentiate  $x^2$?") == key("differentiate x^2")
+        assert key("simplify 5!") != key("simplify 5")
+    
+    def test_cache_evicts_least_recently_used(self, mocked_pipeline, monkeypatch):
+        monkeypatch.setattr(pipeline_module, "_CACHE_MAX_SIZE", 2)
+        response = mocked_pipeline.process("differentiate x^2")
+        
+        mocked_pipeline._cache_response("a", response)
+        mocked_pipeline._cache_response("b", response)
+        mocked_pipeline._get_cached_response("a")
+        mocked_pipeline._cache_response("c", response)
+        
+        assert mocked_pipeline._get_cached_response("a") is not None
+        assert mocked_pipeline._get_cached_response("b") is None
+    
+    def test_concurrent_identical_queries_share_one_run(self, mocked_pipeline):
+        async def run():
+            return await asyncio.gather(
+                mocked_pipeline.aprocess("differentiate x^2"),
+                mocked_pipeline.aprocess("differentiate x^2")
+            )
+        
+        first, second = asyncio.run(run())
+        
+        assert first.answer == second.answer == "2*x"
+        assert mocked_pipeline.router_batcher.route.await_count == 1
+    
+    def test_answer_only_skips_explanation(self, mocked_pipeline):
+        result = mocked_pipeline.process("differentiate x^2", explain=False)
+        
+        assert result.answer == "2*x"
+        assert result.explanation is None
+        mocked_pipeline.rag.aretrieve.assert_not_awaited()
+        mocked_pipeline.explainer.aexplain.assert_not_awaited()
+        assert mocked_pipeline._get_cached_response("differentiate x^2") is None
+    
+    def test_process_stream_yields_answer_before_explanation(self, mocked_pipeline):
+        mocked_pipeline.router.route = Mock(return_value=RoutingDecision(
+            operation="differentiate",
+            expression="x^2",
+            variable="x"
+        ))
+        mocked_pipeline.rag.retrieve = Mock(return_value=[])
+        mocked_pipeline.explainer.explain_stream = Mock(return_value=iter(["Apply ", "the power rule."]))
+        
+        events = list(mocked_pipeline.process_stream("differentiate x^2"))
+        
+        assert [e["stage"] for e in events] == ["answer", "delta", "delta", "done"]
+        assert events[0]["answer"] == "2*x"
+        assert mocked_pipeline._get_cached_response("differentiate x^2").explanation == "Apply the power rule."
+    
+    def test_process_stream_caches_before_done(self, mocked_pipeline):
+        mocked_pipeline.router.route = Mock(return_value=RoutingDecision(
+            operation="differentiate",
+            expression="x^2",
+            variable="x"
+        ))
+        mocked_pipeline.rag.retrieve = Mock(return_value=[])
+        mocked_pipeline.explainer.explain_stream = Mock(return_value=iter(["Apply the power rule."]))
+        
+        for event in mocked_pipeline.process_stream("differentiate x^2"):
+            if event["stage"] == "done":
+                break
+        
+        assert mocked_pipeline._get_cached_response("differentiate x^2") is not None
+    
+    def test_process_stream_replays_cached_failure_as_error(self, mocked_pipeline):
+        mocked_pipeline.router.route = Mock(return_value=RoutingDecision(
+            operation="simplify",
+            expression="not a valid expression @#$"
+        ))
+        mocked_pipeline.rag.retrieve = Mock(return_value=[])
+        
+        first = list(mocked_pipeline.process_stream("simplify garbage"))
+        second = list(mocked_pipeline.process_stream("simplify garbage"))
+        
+        assert [e["stage"] for e in first] == [e["stage"] for e in second] == ["error"]
+        assert second[0]["error_type"] == "parse_error"
+        assert mocked_pipeline.router.route.call_count == 1
+    
+    def test_process_with_trace_matches_process(self, mocked_pipeline):
+        traced, trace = mocked_pipeline.process_with_trace("differentiate x^2")
+        pipeline_module._response_cache.clear()
+        plain = mocked_pipeline.process("differentiate x^2")
+        
+        assert traced.model_dump() == plain.model_dump()
+        assert trace.total_latency_ms >= trace.routing_latency_ms
+    
+    def test_waits_for_result_when_another_worker_holds_lock(self, mocked_pipeline):
+        published = MathResponse(success=True, query="differentiate x^2", operation="differentiate", answer="2*x")
+        shared = Mock()
+        shared.get = AsyncMock(return_value=None)
+        shared.acquire = AsyncMock(return_value=False)
+        shared.wait_for = AsyncMock(return_value=published)
+        mocked_pipeline.shared_cache = shared
+        
+        result = mocked_pipeline.process("differentiate x^2")
+        
+        assert result.answer == "2*x"
+        mocked_pipeline.router_batcher.route.assert_not_awaited()
+        shared.release.assert_not_called()
+
+
+class TestLazyComponents:
+    """Components and clients are only built when first used."""
+    
+    def test_async_client_is_built_on_first_use(self, monkeypatch):
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        pipeline = MathPipeline(langfuse_enabled=False)
+        
+        assert "async_client" not in pipeline.__dict__
+        assert pipeline.router.async_client is pipeline.async_client
+
+
+class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers every chat completion with a fixed differentiate routing."""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        content = json.dumps({"operation": "differentiate", "expression": "x^2", "variable": "x"})
+        body = json.dumps({
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content}
+            }]
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Local OpenAI-compatible server; the pipeline's real clients talk to it."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOpenAIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(pipeline_module, "MathRAG", Mock())
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+class TestSyncWrappers:
+    """process() against a live (local) client rather than a mocked router."""
+    
+    def test_repeated_process_reuses_client_connections(self, fake_openai):
+        pipeline = MathPipeline(langfuse_enabled=False)
+        
+        # Neither query is keyword-classifiable, so both go to the LLM
+        try:
+            first = pipeline.process("how steep is the curve x squared", explain=False)
+            second = pipeline.process("what is the slope of the parabola x times x", explain=False)
+        finally:
+            pipeline.close()
+        
+        assert first.success, first.error
+        assert second.success, second.error
+        assert first.answer == second.answer == "2*x"
+
+
+@pytest.fixture(scope="module")
+def engine():
+    from core.compute import SymPyEngine
+    return SymPyEngine()
+
+
 class TestComputeOnly:
     """Tests that only use the compute engine (no API calls)."""
     
-    @pytest.fixture
-    def engine(self):
-        from core.compute import SymPyEngine
-        return SymPyEngine()
-    
     def test_various_derivatives(self, engine):
         test_cases = [
             ("x^3", "x", "3*x**2"),
@@ -0,0 +1,323 @@
+"""
+Tests for the LLM router and its helpers (no API calls).
+"""
+import json
+import time
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+from core import router as router_module
+from core.router import (
+    MathRouter, RouterBatcher, SemanticRouteCache, classify_query, normalize_query, parse_dsl_query
+)
+from core.models import RoutingDecision
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    router_module._route_cache.clear()
+    yield MathRouter()
+    router_module._route_cache.clear()
+
+
+def _decision(expression):
+    return RoutingDecision(operation="differentiate", expression=expression)
+
+
+def _completion(payload):
+    """Build a fake chat completion whose message content is `payload` as JSON."""
+    message = Mock(content=json.dumps(payload))
+    return Mock(choices=[Mock(message=message)])
+
+
+class TestRouteMemoization:
+    """Test that repeated queries skip the LLM call."""
+
+    def test_normalize_query(self):
+        assert normalize_query("  Differentiate   $x^2$ ") == "differentiate x^2"
+
+    def test_repeat_query_uses_cache(self, router):
+        create = AsyncMock(return_value=_completion({
+            "operation": "differentiate", "expression": "x^2", "variable": "x", "confidence": 1.0
+        }))
+        router.async_client = Mock()
+        router.async_client.chat.completions.create = create
+
+        first = asyncio.run(router.aroute("what is the derivative of x^2"))
+        second = asyncio.run(router.aroute("What is the  derivative of x^2"))
+
+        assert first == second
+        assert create.await_count == 1
+
+    def test_cached_decision_is_a_copy(self, router):
+        router._store_decision("differentiate x^2", _decision("x^2"))
+
+        router._cached_decision("differentiate x^2").assumptions.append("mutated")
+
+        assert router._cached_decision("differentiate x^2").assumptions == []
+
+    def test_expired_decision_is_dropped(self, router, monkeypatch):
+        router._store_decision("differentiate x^2", _decision("x^2"))
+        monkeypatch.setattr(router_module, "_ROUTE_CACHE_TTL_SECONDS", 0)
+
+        assert router._cached_decision("differentiate x^2") is None
+        assert not router_module._route_cache
+
+    def test_persistent_cache_survives_restart(self, router, tmp_path):
+        path = str(tmp_path / "routes.sqlite3")
+        MathRouter(cache_path=path)._store_decision("rate of change of x^2", _decision("x^2"))
+        router_module._route_cache.clear()
+
+        decision = MathRouter(cache_path=path)._cached_decision("Rate of change of  x^2")
+
+        assert decision.expression == "x^2"
+
+
+class TestPersistentCache:
+    """Test that a broken on-disk cache degrades to misses."""
+
+    def test_unopenable_path_disables_cache(self, router, tmp_path):
+        blocker = tmp_path / "not-a-directory"
+        blocker.write_text("")
+
+        broken = MathRouter(cache_path=str(blocker / "routes.sqlite3"))
+
+        assert broken.persistent_cache is None
+        assert broken._cached_decision("rate of change of x^2") is None
+
+    def test_corrupt_row_is_a_miss(self, tmp_path):
+        cache = router_module.PersistentRouteCache(str(tmp_path / "routes.sqlite3"))
+        with cache._conn:
+            cache._conn.execute(
+                "INSERT INTO route_cache VALUES (?, ?, ?, ?)", ("m", "q", "{not json", time.time())
+            )
+
+        assert cache.get("m", "q") is None
+
+
+class TestKeywordClassifier:
+    """Test local routing of unambiguous queries."""
+
+    @pytest.mark.parametrize("query, operation, expression, variable", [
+        ("Differentiate sin(x^2) with respect to x", "differentiate", "sin(x^2)", "x"),
+        ("d/dt t^3", "differentiate", "t^3", "t"),
+        ("integrate x^2 dx", "integrate", "x^2", "x"),
+        ("solve x^2 + y = 0 for y", "solve", "x^2 + y = 0", "y"),
+    ])
+    def test_easy_queries_are_classified(self, query, operation, expression, variable):
+        decision = classify_query(query)
+
+        assert (decision.operation, decision.expression, decision.variable) == (
+            operation, expression, variable
+        )
+
+    @pytest.mark.parametrize("query", [
+        "integrate x^2 from 0 to 1",
+        "differentiate x*y",
+        "what is the derivative of x^2",
+    ])
+    def test_ambiguous_queries_go_to_llm(self, query):
+        assert classify_query(query) is None
+
+    def test_route_skips_llm(self, router):
+        router.async_client = Mock()
+        router.async_client.chat.completions.create = AsyncMock()
+
+        decision = asyncio.run(router.aroute("differentiate x^2"))
+
+        assert decision.expression == "x^2"
+        router.async_client.chat.completions.create.assert_not_awaited()
+
+
+class TestDSL:
+    """Test the explicit "!op expression" routing syntax."""
+
+    def test_dsl_query(self):
+        decision = parse_dsl_query("!int sin(X) dX")
+
+        assert (decision.operation, decision.expression, decision.variable) == (
+            "integrate", "sin(X)", "X"
+        )
+        assert parse_dsl_query("!solve x^2 - y = 0 wrt y").solve_for == "y"
+
+    def test_unknown_operation_is_not_dsl(self):
+        assert parse_dsl_query("!expand (x+1)^2") is None
+
+
+class TestWarmup:
+    """Test startup connection warmup."""
+
+    def test_warm_up_uses_async_client(self, router):
+        router.async_client = Mock()
+        router.async_client.models.list = AsyncMock()
+
+        asyncio.run(router.awarm_up())
+
+        router.async_client.models.list.assert_awaited_once()
+
+    def test_failed_warm_up_is_ignored(self, router):
+        router.async_client = Mock()
+        router.async_client.models.list = AsyncMock(side_effect=RuntimeError("offline"))
+
+        asyncio.run(router.awarm_up())
+
+
+class TestRouteMany:
+    """Test concurrent and offline multi-query routing."""
+
+    def test_route_many_preserves_order(self, router):
+        router.aroute = AsyncMock(side_effect=lambda q: _decision(q))
+
+        results = asyncio.run(router.route_many(["x^2", "x^3", "x^4"], max_concurrency=2))
+
+        assert [r.expression for r in results] == ["x^2", "x^3", "x^4"]
+
+    def test_parse_batch_output(self, router):
+        def line(custom_id, status, expression):
+            return json.dumps({"custom_id": custom_id, "response": {
+                "status_code": status,
+                "body": {"choices": [{"message": {"content": json.dumps(
+                    {"operation": "differentiate", "expression": expression, "confidence": 1.0}
+                )}}]}
+            }})
+        output = "\n".join([line("1", 200, "x^3"), line("0", 500, "x^2")])
+
+        decisions = router.parse_batch_output(output, ["x^2", "x^3"])
+
+        assert decisions[0] is None
+        assert decisions[1].expression == "x^3"
+
+
+class TestSemanticCache:
+    """Test that paraphrases reuse routing decisions."""
+
+    def _router(self, router, embeddings):
+        router.semantic_cache = SemanticRouteCache(threshold=0.9)
+        router.async_client = Mock()
+        router.async_client.embeddings.create = AsyncMock(side_effect=lambda model, input: Mock(
+            data=[Mock(embedding=embeddings[input])]
+        ))
+        router.async_client.chat.completions.create = AsyncMock(return_value=_completion({
+            "operation": "differentiate", "expression": "x^2", "variable": "x", "confidence": 1.0
+        }))
+        return router
+
+    def test_paraphrase_skips_llm(self, router):
+        router = self._router(router, {
+            "rate of change of x^2": [1.0, 0.0],
+            "what is the derivative of x^2": [0.99, 0.05],
+        })
+
+        asyncio.run(router.aroute("rate of change of x^2"))
+        decision = asyncio.run(router.aroute("what is the derivative of x^2"))
+
+        assert decision.expression == "x^2"
+        assert router.async_client.chat.completions.create.await_count == 1
+
+    def test_different_operation_misses(self, router):
+        router = self._router(router, {
+            "what is the derivative of x^2": [1.0, 0.0],
+            "what is the integral of x^2": [0.99, 0.05],
+        })
+
+        asyncio.run(router.aroute("what is the derivative of x^2"))
+        asyncio.run(router.aroute("what is the integral of x^2"))
+
+        assert router.async_client.chat.completions.create.await_count == 2
+
+    def test_different_expression_misses(self, router):
+        router = self._router(router, {
+            "rate of change of x^2": [1.0, 0.0],
+            "rate of change of x^3": [0.99, 0.05],
+        })
+
+        asyncio.run(router.aroute("rate of change of x^2"))
+        asyncio.run(router.aroute("rate of change of x^3"))
+
+        assert router.async_client.chat.completions.create.await_count == 2
+
+
+class TestRouterBatcher:
+    """Test coalescing of concurrent routing requests."""
+
+    def test_concurrent_queries_share_one_call(self, router):
+        router.aroute_batch = AsyncMock(side_effect=lambda qs: [_decision(q) for q in qs])
+        router.aroute = AsyncMock()
+        batcher = RouterBatcher(router, window_ms=20)
+
+        async def run():
+            return await asyncio.gather(*(batcher.route(q) for q in ["x^2", "x^3", "x^4"]))
+
+        results = asyncio.run(run())
+
+        assert [r.expression for r in results] == ["x^2", "x^3", "x^4"]
+        router.aroute_batch.assert_awaited_once()
+        router.aroute.assert_not_awaited()
+
+    def test_single_query_uses_plain_route(self, router):
+        router.aroute_batch = AsyncMock()
+        router.aroute = AsyncMock(return_value=_decision("x^2"))
+        batcher = RouterBatcher(router, window_ms=1)
+
+        result = asyncio.run(batcher.route("x^2"))
+
+        assert result.expression == "x^2"
+        router.aroute_batch.assert_not_awaited()
+
+    def test_failed_batch_falls_back_per_query(self, router):
+        router.aroute_batch = AsyncMock(side_effect=RuntimeError("bad reply"))
+        router.aroute = AsyncMock(side_effect=lambda q: _decision(q))
+        batcher = RouterBatcher(router, window_ms=20)
+
+        async def run():
+            return await asyncio.gather(*(batcher.route(q) for q in ["x^2", "x^3"]))
+
+        results = asyncio.run(run())
+
+        assert [r.expression for r in results] == ["x^2", "x^3"]
+        assert router.aroute.await_count == 2
+
+    def test_flush_tasks_are_held_until_done(self, router):
+        release = asyncio.Event()
+
+        async def slow_route(query):
+            await release.wait()
+            return _decision(query)
+
+        router.aroute = AsyncMock(side_effect=slow_route)
+        batcher = RouterBatcher(router, window_ms=1)
+
+        async def run():
+            caller = asyncio.create_task(batcher.route("x^2"))
+            await asyncio.sleep(0.05)
+            in_flight = len(batcher._tasks)
+            release.set()
+            result = await caller
+            await asyncio.sleep(0)
+            return in_flight, result
+
+        in_flight, result = asyncio.run(run())
+
+        assert in_flight == 1
+        assert result.expression == "x^2"
+        assert not batcher._tasks
+
+    def test_aclose_cancels_worker_and_waiting_callers(self, router):
+        async def hang(query):
+            await asyncio.sleep(3600)
+
+        router.aroute = AsyncMock(side_effect=hang)
+        batcher = RouterBatcher(router, window_ms=1)
+
+        async def run():
+            caller = asyncio.create_task(batcher.route("x^2"))
+            await asyncio.sleep(0.05)
+            await batcher.aclose()
+            with pytest.raises(asyncio.CancelledError):
+                await caller
+
+        asyncio.run(run())
+
+        assert batcher._worker is None
+        assert not batcher._tasks